@@ -2,7 +2,9 @@ from flask import Flask, request, abort
 import json
 from functools import wraps
 from jose import jwt
-from urllib.request import urlopen
+
+from fsnd_common.jwks import JWKSCache
+from fsnd_common.token_cache import VerifiedTokenCache
 
 
 app = Flask(__name__)
@@ -11,6 +13,12 @@ AUTH0_DOMAIN = @TODO_REPLACE_WITH_YOUR_DOMAIN
 ALGORITHMS = ['RS256']
 API_AUDIENCE = @TODO_REPLACE_WITH_YOUR_API_AUDIENCE
 
+# Signing keys of AUTH0_DOMAIN, fetched once and refreshed in the background
+# instead of on every request.
+jwks = JWKSCache(f'https://{AUTH0_DOMAIN}/.well-known/jwks.json')
+# Payloads of tokens that already passed verify_decode_jwt, until they expire.
+verified_tokens = VerifiedTokenCache()
+
 
 class AuthError(Exception):
     def __init__(self, error, status_code):
@@ -29,7 +37,7 @@ def get_token_auth_header():
         }, 401)
 
     parts = auth.split()
-    if parts[0].lower() != 'bearer':
+    if not parts or parts[0].lower() != 'bearer':
         raise AuthError({
             'code': 'invalid_header',
             'description': 'Authorization header must start with "Bearer".'
@@ -52,25 +60,14 @@ def get_token_auth_header():
 
 
 def verify_decode_jwt(token):
-    jsonurl = urlopen(f'https://{AUTH0_DOMAIN}/.well-known/jwks.json')
-    jwks = json.loads(jsonurl.read())
     unverified_header = jwt.get_unverified_header(token)
-    rsa_key = {}
     if 'kid' not in unverified_header:
         raise AuthError({
             'code': 'invalid_header',
             'description': 'Authorization malformed.'
         }, 401)
 
-    for key in jwks['keys']:
-        if key['kid'] == unverified_header['kid']:
-            rsa_key = {
-                'kty': key['kty'],
-                'kid': key['kid'],
-                'use': key['use'],
-                'n': key['n'],
-                'e': key['e']
-            }
+    rsa_key = jwks.get_key(unverified_header['kid'])
     if rsa_key:
         try:
             payload = jwt.decode(
@@ -109,10 +106,13 @@ def requires_auth(f):
     @wraps(f)
     def wrapper(*args, **kwargs):
         token = get_token_auth_header()
-        try:
-            payload = verify_decode_jwt(token)
-        except:
-            abort(401)
+        payload = verified_tokens.get(token)
+        if payload is None:
+            try:
+                payload = verify_decode_jwt(token)
+            except:
+                abort(401)
+            verified_tokens.put(token, payload, payload.get('exp'))
         return f(payload, *args, **kwargs)
 
     return wrapper
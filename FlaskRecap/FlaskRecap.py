@@ -1,6 +1,9 @@
-from flask import Flask, request, jsonify, abort
+from flask import Flask, request, abort
+
+from fsnd_common.json_provider import install_json_provider, jsonify
 
 app = Flask(__name__)
+install_json_provider(app)
 
 greetings = {
             'en': 'hello', 
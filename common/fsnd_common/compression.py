@@ -0,0 +1,217 @@
+"""
+Compresses responses with brotli or gzip, whichever Accept-Encoding prefers.
+
+install_compression(app) wraps app.wsgi_app in a CompressionMiddleware. It
+reads these app settings, defaulting as shown:
+
+    COMPRESS_MIN_SIZE = 1024         # smaller bodies are sent as they are
+    COMPRESS_GZIP_LEVEL = 6
+    COMPRESS_BROTLI_QUALITY = 5      # brotli is used only when installed
+    COMPRESS_CACHE_SIZE = 256        # compressed GET responses kept, 0 for none
+    COMPRESS_MIMETYPES = COMPRESSIBLE_MIMETYPES
+
+A response with Cache-Control: no-transform is never compressed. Pages that
+echo what the client sent, a search term for instance, should set it: when
+attacker-chosen text is compressed together with the rest of a page, the
+compressed length leaks that page's content (BREACH).
+"""
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict
+
+from werkzeug.http import parse_accept_header
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Pages, their static css, js and svg, and JSON APIs, streamed ones included.
+COMPRESSIBLE_MIMETYPES = frozenset([
+    'text/html', 'text/css', 'text/javascript', 'application/javascript', 'image/svg+xml',
+    'application/json', 'application/x-ndjson',
+])
+
+#----------------------------------------------------------------------------#
+# Response compression.
+#----------------------------------------------------------------------------#
+
+def install_compression(app):
+    """Wraps app.wsgi_app in a CompressionMiddleware set up from the
+    COMPRESS_* settings above."""
+    app.config.setdefault('COMPRESS_MIN_SIZE', 1024)
+    app.config.setdefault('COMPRESS_GZIP_LEVEL', 6)
+    app.config.setdefault('COMPRESS_BROTLI_QUALITY', 5)
+    app.config.setdefault('COMPRESS_CACHE_SIZE', 256)
+    app.config.setdefault('COMPRESS_MIMETYPES', COMPRESSIBLE_MIMETYPES)
+    app.wsgi_app = CompressionMiddleware(
+        app.wsgi_app,
+        min_size=app.config['COMPRESS_MIN_SIZE'],
+        gzip_level=app.config['COMPRESS_GZIP_LEVEL'],
+        brotli_quality=app.config['COMPRESS_BROTLI_QUALITY'],
+        cache_size=app.config['COMPRESS_CACHE_SIZE'],
+        mimetypes=app.config['COMPRESS_MIMETYPES'])
+
+
+class CompressionMiddleware(object):
+    """WSGI middleware compressing responses of the given mimetypes.
+
+    The encoding is negotiated from Accept-Encoding, brotli first when it is
+    installed. Compressed GET responses are kept in an LRU keyed by their
+    ETag, or a hash of the body, and get the encoding appended to their ETag.
+    A response without a Content-Length is compressed chunk by chunk as it
+    is sent.
+    """
+
+    def __init__(self, app, min_size=1024, gzip_level=6, brotli_quality=5, cache_size=256,
+                 mimetypes=COMPRESSIBLE_MIMETYPES):
+        self.app = app
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.cache_size = cache_size
+        self.mimetypes = frozenset(mimetypes)
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.encodings = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+    def negotiate(self, accept_encoding):
+        accept = parse_accept_header(accept_encoding)
+        best, best_quality = None, 0
+        for encoding in self.encodings:
+            quality = accept.quality(encoding)
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+    def __call__(self, environ, start_response):
+        encoding = None
+        if environ['REQUEST_METHOD'] != 'HEAD':
+            encoding = self.negotiate(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        revalidating = False
+        if encoding is not None and 'HTTP_IF_NONE_MATCH' in environ:
+            if_none_match = environ['HTTP_IF_NONE_MATCH']
+            revalidating = '-' + encoding + '"' in if_none_match
+            environ['HTTP_IF_NONE_MATCH'] = if_none_match.replace('-' + encoding + '"', '"')
+
+        captured = []
+
+        def capture(status, headers, exc_info=None):
+            if exc_info is not None and captured:
+                raise exc_info[1].with_traceback(exc_info[2])
+            captured[:] = [status, headers]
+            return self._write_unsupported
+
+        app_iter = self.app(environ, capture)
+        status, headers = captured
+        code = int(status.split(' ', 1)[0])
+        if code == 304:
+            # A 304 has no Content-Type; it confirms the variant the client has.
+            start_response(status, _tag_etag(_add_vary(headers), encoding) if revalidating else headers)
+            return app_iter
+
+        header = _headers(headers)
+        mimetype = header.get('content-type', '').split(';')[0].strip().lower()
+        if mimetype not in self.mimetypes:
+            start_response(status, headers)
+            return app_iter
+
+        headers = _add_vary(headers)
+        if (encoding is None or 'content-encoding' in header or 'content-range' in header
+                or 'no-transform' in header.get('cache-control', '')):
+            start_response(status, headers)
+            return app_iter
+
+        length = header.get('content-length')
+        if length is None:
+            start_response(status, _tag_etag(_encoded(headers, encoding), encoding))
+            return self._compress_stream(app_iter, encoding)
+        if int(length) < self.min_size:
+            start_response(status, headers)
+            return app_iter
+
+        try:
+            body = b''.join(app_iter)
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+        compressed = self._compressed(body, encoding, header.get('etag'),
+                                      cacheable=code == 200 and environ['REQUEST_METHOD'] == 'GET')
+        if len(compressed) >= len(body):
+            start_response(status, headers)
+            return [body]
+        headers = _encoded(headers, encoding) + [('Content-Length', str(len(compressed)))]
+        start_response(status, _tag_etag(headers, encoding))
+        return [compressed]
+
+    def _compressed(self, body, encoding, etag, cacheable):
+        if not cacheable or self.cache_size <= 0:
+            return self.compress(body, encoding)
+        key = (encoding, etag if etag and not etag.startswith('W/') else hashlib.sha1(body).digest())
+        with self.lock:
+            compressed = self.cache.get(key)
+            if compressed is not None:
+                self.cache.move_to_end(key)
+                return compressed
+        compressed = self.compress(body, encoding)
+        with self.lock:
+            self.cache[key] = compressed
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return compressed
+
+    def compress(self, body, encoding):
+        if encoding == 'br':
+            return brotli.compress(body, quality=self.brotli_quality)
+        compressor = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 31)
+        return compressor.compress(body) + compressor.flush()
+
+    def _compress_stream(self, app_iter, encoding):
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=self.brotli_quality)
+            compress, flush, finish = compressor.process, compressor.flush, compressor.finish
+        else:
+            compressor = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 31)
+            compress, finish = compressor.compress, compressor.flush
+            flush = lambda: compressor.flush(zlib.Z_SYNC_FLUSH)
+        try:
+            for chunk in app_iter:
+                if chunk:
+                    # Flush every chunk so a streamed response keeps streaming.
+                    yield compress(chunk) + flush()
+            yield finish()
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+
+    def _write_unsupported(self, data):
+        raise RuntimeError('CompressionMiddleware does not support the WSGI write() callable')
+
+
+def _headers(headers):
+    return {name.lower(): value for name, value in headers}
+
+
+def _add_vary(headers):
+    for i, (name, value) in enumerate(headers):
+        if name.lower() == 'vary':
+            if 'accept-encoding' not in value.lower():
+                headers = list(headers)
+                headers[i] = (name, value + ', Accept-Encoding')
+            return headers
+    return list(headers) + [('Vary', 'Accept-Encoding')]
+
+
+def _encoded(headers, encoding):
+    return [(name, value) for name, value in headers if name.lower() != 'content-length'] + [
+        ('Content-Encoding', encoding)]
+
+
+def _tag_etag(headers, encoding):
+    tagged = []
+    for name, value in headers:
+        if name.lower() == 'etag' and value.endswith('"'):
+            value = value[:-1] + '-' + encoding + '"'
+        tagged.append((name, value))
+    return tagged
@@ -0,0 +1,76 @@
+"""
+JSON responses encoded with orjson when it is installed, and with the
+standard library json module otherwise.
+
+Both providers give the same output for the same app config: keys sorted
+when JSON_SORT_KEYS is set, anything they can't encode natively (datetimes,
+dates, Decimals, UUIDs...) handed to the app's json_encoder, as flask.jsonify
+does. The only difference is that orjson always writes non-ASCII text as
+UTF-8, where the json module escapes it unless JSON_AS_ASCII is off; both
+decode to the same data. Call install_json_provider(app) once, then use
+jsonify and dumps from here in place of Flask's.
+"""
+import json
+
+from flask import current_app
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class StdlibJSONProvider(object):
+    """Encodes with the standard library json module and the app's json_encoder."""
+    name = 'json'
+
+    def __init__(self, app):
+        self.app = app
+
+    def dumps(self, obj, pretty=False):
+        """Returns obj encoded to bytes, compact unless pretty."""
+        return json.dumps(
+            obj,
+            cls=self.app.json_encoder,
+            sort_keys=self.app.config['JSON_SORT_KEYS'],
+            ensure_ascii=self.app.config['JSON_AS_ASCII'],
+            indent=2 if pretty else None,
+            separators=None if pretty else (',', ':')
+        ).encode('utf-8')
+
+
+class OrjsonJSONProvider(StdlibJSONProvider):
+    """Encodes with orjson, straight to bytes. Datetimes, and anything else
+    orjson can't encode natively, go through the app's json_encoder so they
+    come out as the stdlib provider writes them."""
+    name = 'orjson'
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.default = app.json_encoder().default
+        self.options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if app.config['JSON_SORT_KEYS']:
+            self.options |= orjson.OPT_SORT_KEYS
+
+    def dumps(self, obj, pretty=False):
+        options = (self.options | orjson.OPT_INDENT_2) if pretty else self.options
+        return orjson.dumps(obj, default=self.default, option=options)
+
+
+def install_json_provider(app):
+    """Picks orjson when it is installed, json otherwise."""
+    provider = OrjsonJSONProvider if orjson is not None else StdlibJSONProvider
+    app.extensions['json_provider'] = provider(app)
+
+
+def jsonify(obj):
+    """flask.jsonify for a single object, encoded by the app's json provider."""
+    app = current_app._get_current_object()
+    pretty = app.config['JSONIFY_PRETTYPRINT_REGULAR'] or app.debug
+    body = app.extensions['json_provider'].dumps(obj, pretty)
+    return app.response_class(body + b'\n', mimetype=app.config['JSONIFY_MIMETYPE'])
+
+
+def dumps(obj):
+    """obj encoded to bytes by the current app's json provider."""
+    return current_app.extensions['json_provider'].dumps(obj)
@@ -0,0 +1,108 @@
+"""
+The identity provider's JSON Web Key Set, cached in memory so verifying a
+token normally never waits on the network.
+"""
+import json
+import threading
+import time
+from urllib.request import urlopen
+
+
+def fetch_jwks(url, timeout=5):
+    """Downloads and parses a JSON Web Key Set."""
+    with urlopen(url, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+class JWKSCache(object):
+    """A JSON Web Key Set kept in memory and indexed by key id (kid).
+
+    fetcher is called with the url and must return the parsed key set;
+    tests and benchmarks can pass a stub instead of hitting the network.
+    """
+
+    def __init__(self, url, ttl=3600, refresh_ahead=300, min_refetch_interval=30, fetcher=fetch_jwks):
+        self.url = url
+        self.ttl = ttl
+        self.refresh_ahead = refresh_ahead
+        self.min_refetch_interval = min_refetch_interval
+        self.fetcher = fetcher
+        self.keys = {}
+        self.fetched_at = None
+        self.attempted_at = None
+        self.refreshing = False
+        self.lock = threading.Lock()
+
+    def get_key(self, kid):
+        """Returns the rsa key for kid, or None if the identity provider has
+        no such key.
+
+        Keys are refetched once they are older than ttl, and refreshed in a
+        background thread during the last refresh_ahead seconds before that.
+        An unknown kid triggers a refetch, at most once every
+        min_refetch_interval seconds, to pick up rotated keys without letting
+        bogus kids hammer the provider. If a refetch fails the last known
+        keys keep being served.
+        """
+        if self.fetched_at is None:
+            self.refresh()
+        else:
+            age = time.monotonic() - self.fetched_at
+            if age >= self.ttl and self._may_refetch():
+                self.refresh()
+            elif age >= self.ttl - self.refresh_ahead and self._may_refetch():
+                self._refresh_in_background()
+
+        key = self.keys.get(kid)
+        if key is None and self._may_refetch():
+            self.refresh()
+            key = self.keys.get(kid)
+        return key
+
+    def refresh(self):
+        with self.lock:
+            self.attempted_at = time.monotonic()
+        try:
+            jwks = self.fetcher(self.url)
+        except Exception:
+            # Keep serving the keys we have until the provider is back.
+            if not self.keys:
+                raise
+            return
+        keys = {}
+        for key in jwks['keys']:
+            keys[key['kid']] = {
+                'kty': key['kty'],
+                'kid': key['kid'],
+                'use': key['use'],
+                'n': key['n'],
+                'e': key['e']
+            }
+        with self.lock:
+            self.keys = keys
+            self.fetched_at = time.monotonic()
+
+    def invalidate(self):
+        with self.lock:
+            self.keys = {}
+            self.fetched_at = None
+            self.attempted_at = None
+
+    def _may_refetch(self):
+        with self.lock:
+            return self.attempted_at is None or time.monotonic() - self.attempted_at >= self.min_refetch_interval
+
+    def _refresh_in_background(self):
+        with self.lock:
+            if self.refreshing:
+                return
+            self.refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+            finally:
+                with self.lock:
+                    self.refreshing = False
+
+        threading.Thread(target=run, daemon=True).start()
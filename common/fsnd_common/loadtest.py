@@ -0,0 +1,191 @@
+"""
+Replays a weighted mix of requests against a Flask app and reports latency
+percentiles, throughput and peak RSS per endpoint as JSON.
+
+Each app's benchmarks/load.py only lists its endpoints, each a name, a
+weight and a callable building a Request from a seeded random.Random:
+
+    endpoints = [
+        Endpoint('GET /drinks', 3, lambda rng: Request('GET', '/drinks')),
+        Endpoint('POST /quizzes', 1, lambda rng: post_json('/quizzes', {'previous_questions': []})),
+    ]
+    write_results(run_mix(app, endpoints, 1000), None)
+"""
+import http.client
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import threading
+import time
+from collections import namedtuple
+from urllib.parse import urlencode
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+Endpoint = namedtuple('Endpoint', 'name weight request')
+# body is sent as it is, with whatever Content-Type the headers give it.
+Request = namedtuple('Request', 'method path body headers', defaults=(None, {}))
+
+
+def post_form(path, fields):
+    return Request('POST', path, urlencode(fields), {'Content-Type': 'application/x-www-form-urlencoded'})
+
+
+def post_json(path, obj):
+    return Request('POST', path, json.dumps(obj), {'Content-Type': 'application/json'})
+
+
+def current_rss():
+    """Resident set size of this process right now, in bytes."""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        # No procfs (macOS): fall back to the peak, which never goes down.
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class TestClientTransport(object):
+    name = 'test_client'
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def send(self, request):
+        response = self.client.open(request.path, method=request.method, data=request.body,
+                                    headers=request.headers)
+        response.get_data()
+        response.close()
+        return response.status_code
+
+    def close(self):
+        pass
+
+
+class _QuietHandler(WSGIRequestHandler):
+
+    def log_request(self, *args):
+        pass
+
+
+class WSGIServerTransport(object):
+    name = 'wsgi_server'
+
+    def __init__(self, app):
+        self.server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=_QuietHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.connection = http.client.HTTPConnection('127.0.0.1', self.server.server_port)
+
+    def send(self, request):
+        self.connection.request(request.method, request.path, body=request.body, headers=request.headers)
+        response = self.connection.getresponse()
+        response.read()
+        return response.status
+
+    def close(self):
+        self.connection.close()
+        self.server.shutdown()
+
+
+def run_mix(app, endpoints, requests, seed=0, warmup=20, server=False, scale=None, name=None):
+    """Sends `requests` requests drawn from the weighted endpoints, after
+    `warmup` untimed ones, and returns the results as a JSON-ready dict.
+
+    Each endpoint's request callable builds a Request from a random.Random
+    seeded with `seed`, so the same seed replays exactly the same requests.
+    """
+    rng = random.Random(seed)
+    transport = (WSGIServerTransport if server else TestClientTransport)(app)
+    names = [endpoint.name for endpoint in endpoints]
+    weights = [endpoint.weight for endpoint in endpoints]
+    by_name = {endpoint.name: endpoint for endpoint in endpoints}
+    stats = {endpoint.name: {'timings': [], 'errors': 0, 'peak_rss': 0} for endpoint in endpoints}
+
+    try:
+        for endpoint_name in rng.choices(names, weights, k=warmup):
+            transport.send(by_name[endpoint_name].request(rng))
+        rss_before = current_rss()
+        started = time.perf_counter()
+        for endpoint_name in rng.choices(names, weights, k=requests):
+            request = by_name[endpoint_name].request(rng)
+            start = time.perf_counter()
+            status = transport.send(request)
+            elapsed = time.perf_counter() - start
+            endpoint_stats = stats[endpoint_name]
+            endpoint_stats['timings'].append(elapsed)
+            if status >= 500:
+                endpoint_stats['errors'] += 1
+            endpoint_stats['peak_rss'] = max(endpoint_stats['peak_rss'], current_rss())
+        wall = time.perf_counter() - started
+    finally:
+        transport.close()
+
+    results = {}
+    for endpoint_name, endpoint_stats in stats.items():
+        timings = sorted(endpoint_stats['timings'])
+        results[endpoint_name] = _summary(timings, endpoint_stats['errors'])
+        results[endpoint_name]['peak_rss_mb'] = round(endpoint_stats['peak_rss'] / 2**20, 1)
+    everything = sorted(t for endpoint_stats in stats.values() for t in endpoint_stats['timings'])
+    total = _summary(everything, sum(s['errors'] for s in stats.values()))
+    total['throughput_rps'] = round(len(everything) / wall, 1) if wall else None
+    total['rss_before_mb'] = round(rss_before / 2**20, 1)
+    total['peak_rss_mb'] = round(max(s['peak_rss'] for s in stats.values()) / 2**20, 1)
+    return {
+        'app': name,
+        'transport': transport.name,
+        'seed': seed,
+        'requests': requests,
+        'scale': scale or {},
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+        },
+        'total': total,
+        'endpoints': results,
+    }
+
+
+def _summary(timings, errors):
+    seconds = sum(timings)
+    return {
+        'count': len(timings),
+        'errors': errors,
+        'mean_ms': round(seconds / len(timings) * 1000, 3) if timings else None,
+        'p50_ms': _ms(percentile(timings, 0.50)),
+        'p95_ms': _ms(percentile(timings, 0.95)),
+        'p99_ms': _ms(percentile(timings, 0.99)),
+        # Requests per second of time spent on this endpoint alone.
+        'throughput_rps': round(len(timings) / seconds, 1) if seconds else None,
+    }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+def add_arguments(parser):
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--server', action='store_true', help='replay through a local WSGI server over HTTP')
+    parser.add_argument('--output', help='write the JSON results to this file instead of stdout')
+
+
+def write_results(results, output=None):
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if output:
+        with open(output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
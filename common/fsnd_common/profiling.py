@@ -0,0 +1,154 @@
+"""
+Counts and times the SQL statements of every request.
+
+install_profiler(app) adds X-Query-Count and Server-Timing headers to each
+response and logs requests slower than a threshold with their most
+expensive statements. It reads these app settings, defaulting as shown:
+
+    PROFILE_HEADERS = True           # send the two headers
+    PROFILE_SLOW_REQUEST_MS = 500    # log requests at least this slow
+    PROFILE_TOP_STATEMENTS = 5       # statements listed per slow request
+
+capture_queries() and assert_max_queries(n) record the statements of a
+block, for tests that hold pages to a query budget.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_local = threading.local()
+
+#----------------------------------------------------------------------------#
+# Query profiling.
+#----------------------------------------------------------------------------#
+
+class QueryLog(object):
+    """The statements executed while the log was active, with their durations."""
+
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    @property
+    def seconds(self):
+        return sum(seconds for _, seconds in self.statements)
+
+    def top(self, n):
+        """Returns the n statements that took longest in total, as
+        (statement, executions, seconds), so a query repeated per row shows
+        up as one entry with a high execution count."""
+        totals = {}
+        for statement, seconds in self.statements:
+            executions, total = totals.get(statement, (0, 0.0))
+            totals[statement] = (executions + 1, total + seconds)
+        ranked = sorted(totals.items(), key=lambda item: item[1][1], reverse=True)
+        return [(statement, executions, seconds) for statement, (executions, seconds) in ranked[:n]]
+
+    def format(self, n):
+        return '\n'.join('{:>4}x {:8.2f} ms  {}'.format(executions, seconds * 1000, ' '.join(statement.split()))
+                         for statement, executions, seconds in self.top(n))
+
+
+def _active_logs():
+    logs = getattr(_local, 'logs', None)
+    if logs is None:
+        logs = _local.logs = []
+    return logs
+
+
+# The start time is kept on the statement's own execution context, so a
+# statement that fails, and never reaches after_cursor_execute, leaves
+# nothing behind to be mistaken for the next statement's start.
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started_at = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _record(statement, context)
+
+
+@event.listens_for(Engine, 'handle_error')
+def _handle_error(exception_context):
+    # Failed statements count and take time too.
+    context = exception_context.execution_context
+    if context is not None and hasattr(context, '_query_started_at'):
+        _record(exception_context.statement, context)
+
+
+def _record(statement, context):
+    seconds = time.perf_counter() - context._query_started_at
+    for log in _active_logs():
+        log.statements.append((statement, seconds))
+
+
+@contextmanager
+def capture_queries():
+    """Records every statement any engine executes in this thread while
+    the block runs."""
+    log = QueryLog()
+    logs = _active_logs()
+    logs.append(log)
+    try:
+        yield log
+    finally:
+        logs.remove(log)
+
+
+@contextmanager
+def assert_max_queries(n):
+    """Fails when the block executes more than n statements.
+
+        with assert_max_queries(1):
+            client.get('/')
+    """
+    with capture_queries() as log:
+        yield log
+    if log.count > n:
+        raise AssertionError('{} queries executed, expected at most {}:\n{}'.format(
+            log.count, n, log.format(n=log.count)))
+
+
+def install_profiler(app):
+    """Counts and times the queries of every request, see the PROFILE_*
+    settings above."""
+    app.config.setdefault('PROFILE_HEADERS', True)
+    app.config.setdefault('PROFILE_SLOW_REQUEST_MS', 500)
+    app.config.setdefault('PROFILE_TOP_STATEMENTS', 5)
+
+    @app.before_request
+    def start_query_log():
+        g.query_log = QueryLog()
+        g.request_started_at = time.perf_counter()
+        _active_logs().append(g.query_log)
+
+    @app.after_request
+    def report_query_log(response):
+        log = g.get('query_log')
+        if log is None:
+            return response
+        elapsed_ms = (time.perf_counter() - g.request_started_at) * 1000
+        if app.config['PROFILE_HEADERS']:
+            response.headers['X-Query-Count'] = str(log.count)
+            response.headers.add('Server-Timing', 'db;dur={:.2f};desc="{} queries", app;dur={:.2f}'.format(
+                log.seconds * 1000, log.count, elapsed_ms))
+        if elapsed_ms >= app.config['PROFILE_SLOW_REQUEST_MS']:
+            app.logger.warning('slow request %s %s: %.1f ms, %d queries in %.1f ms\n%s',
+                               request.method, request.full_path.rstrip('?'),
+                               elapsed_ms, log.count, log.seconds * 1000,
+                               log.format(app.config['PROFILE_TOP_STATEMENTS']))
+        return response
+
+    @app.teardown_request
+    def stop_query_log(exc):
+        log = g.pop('query_log', None)
+        if log is not None and log in _active_logs():
+            _active_logs().remove(log)
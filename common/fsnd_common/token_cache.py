@@ -0,0 +1,62 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+class VerifiedTokenCache(object):
+    """A bounded LRU of bearer tokens that already passed verification.
+
+    Tokens are stored by their sha256 digest, mapped to what was derived from
+    them (the decoded payload, or anything built from it), and are dropped at
+    expires_at, normally the token's exp claim, so a client reusing a bearer
+    token pays for signature and claim verification only once. Values
+    without an expiry are never cached. Safe to share between threads; hits
+    and misses are counted for monitoring.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, token):
+        digest = hashlib.sha256(token.encode('utf-8')).digest()
+        with self.lock:
+            entry = self.entries.get(digest)
+            if entry is not None:
+                value, expires_at = entry
+                if time.time() < expires_at:
+                    self.entries.move_to_end(digest)
+                    self.hits += 1
+                    return value
+                del self.entries[digest]
+            self.misses += 1
+            return None
+
+    def put(self, token, value, expires_at):
+        if not isinstance(expires_at, (int, float)):
+            return
+        digest = hashlib.sha256(token.encode('utf-8')).digest()
+        with self.lock:
+            self.entries[digest] = (value, expires_at)
+            self.entries.move_to_end(digest)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self.entries),
+                'maxsize': self.maxsize
+            }
@@ -0,0 +1,9 @@
+from setuptools import setup
+
+setup(
+    name='fsnd-common',
+    version='0.1.0',
+    description='Helpers shared by the Full-Stack Nanodegree example apps',
+    packages=['fsnd_common'],
+    install_requires=['Flask'],
+)
@@ -0,0 +1,57 @@
+import json
+import unittest
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask import Flask
+
+from fsnd_common import json_provider
+from fsnd_common.json_provider import OrjsonJSONProvider, StdlibJSONProvider, install_json_provider, jsonify
+
+VALUES = {
+    'name': 'Flat White',
+    'price': Decimal('3.50'),
+    'opened': date(2020, 1, 2),
+    'updated': datetime(2020, 1, 2, 3, 4, 5),
+    'id': uuid.UUID(int=1),
+    'recipe': [{'name': 'milk', 'parts': 2}],
+}
+
+
+class JSONProviderTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app = Flask(__name__)
+
+    @unittest.skipIf(json_provider.orjson is None, 'orjson is not installed')
+    def test_providers_agree(self):
+        for sort_keys in (True, False):
+            self.app.config['JSON_SORT_KEYS'] = sort_keys
+            for pretty in (False, True):
+                stdlib = StdlibJSONProvider(self.app).dumps(VALUES, pretty)
+                fast = OrjsonJSONProvider(self.app).dumps(VALUES, pretty)
+                self.assertEqual(json.loads(fast), json.loads(stdlib))
+                if sort_keys:
+                    self.assertEqual(fast, stdlib)
+
+    def test_falls_back_to_app_json_encoder(self):
+        install_json_provider(self.app)
+        with self.app.app_context():
+            data = json.loads(jsonify(VALUES).get_data())
+
+        self.assertEqual(data['price'], '3.50')
+        self.assertEqual(data['opened'], 'Thu, 02 Jan 2020 00:00:00 GMT')
+        self.assertEqual(data['updated'], 'Thu, 02 Jan 2020 03:04:05 GMT')
+        self.assertEqual(data['id'], '00000000-0000-0000-0000-000000000001')
+
+    def test_keys_sorted_like_flask_jsonify(self):
+        install_json_provider(self.app)
+        with self.app.app_context():
+            body = jsonify({'b': 1, 'a': {'d': 2, 'c': 3}}).get_data()
+
+        self.assertEqual(body, b'{"a":{"c":3,"d":2},"b":1}\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from fsnd_common.jwks import JWKSCache
+
+
+def jwk(kid):
+    return {'kty': 'RSA', 'kid': kid, 'use': 'sig', 'alg': 'RS256', 'n': 'n-' + kid, 'e': 'AQAB'}
+
+
+class StubFetcher(object):
+    """Stands in for the identity provider: returns the key set of kids,
+    counts fetches, and raises instead while failing is set."""
+
+    def __init__(self, *kids):
+        self.kids = list(kids)
+        self.fetches = 0
+        self.failing = False
+        self.fetched = threading.Event()
+
+    def __call__(self, url):
+        self.fetches += 1
+        try:
+            if self.failing:
+                raise OSError('identity provider unavailable')
+            return {'keys': [jwk(kid) for kid in self.kids]}
+        finally:
+            self.fetched.set()
+
+
+class JWKSCacheTestCase(unittest.TestCase):
+
+    def age(self, cache, seconds):
+        cache.fetched_at -= seconds
+        cache.attempted_at -= seconds
+
+    # Tests the first lookup downloads the key set from the identity provider
+    def test_cold_fetch(self):
+        requests = []
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                requests.append(self.path)
+                body = json.dumps({'keys': [jwk('a')]}).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = HTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            cache = JWKSCache('http://127.0.0.1:{}/.well-known/jwks.json'.format(server.server_port))
+            key = cache.get_key('a')
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        self.assertEqual(requests, ['/.well-known/jwks.json'])
+        self.assertEqual(key, {k: jwk('a')[k] for k in ('kty', 'kid', 'use', 'n', 'e')})
+
+    # Tests keys are served from memory until the ttl passes
+    def test_ttl_hit(self):
+        fetcher = StubFetcher('a')
+        cache = JWKSCache('stub', ttl=3600, fetcher=fetcher)
+        for _ in range(5):
+            self.assertEqual(cache.get_key('a')['n'], 'n-a')
+        self.assertEqual(fetcher.fetches, 1)
+
+        self.age(cache, 3600)
+        cache.get_key('a')
+        self.assertEqual(fetcher.fetches, 2)
+
+    # Tests an unknown kid refetches once, then waits out min_refetch_interval
+    def test_unknown_kid_refetch_is_rate_limited(self):
+        fetcher = StubFetcher('a')
+        cache = JWKSCache('stub', min_refetch_interval=30, fetcher=fetcher)
+        cache.get_key('a')
+        cache.attempted_at -= 30
+
+        # The provider rotated in key b.
+        fetcher.kids.append('b')
+        self.assertEqual(cache.get_key('b')['n'], 'n-b')
+        self.assertEqual(fetcher.fetches, 2)
+        for _ in range(5):
+            self.assertIsNone(cache.get_key('bogus'))
+        self.assertEqual(fetcher.fetches, 2)
+
+    # Tests the last known keys are served while the provider is down
+    def test_serves_stale_keys_when_fetch_fails(self):
+        fetcher = StubFetcher('a')
+        cache = JWKSCache('stub', ttl=3600, fetcher=fetcher)
+        cache.get_key('a')
+        fetcher.failing = True
+        self.age(cache, 3600)
+
+        self.assertEqual(cache.get_key('a')['n'], 'n-a')
+        self.assertEqual(fetcher.fetches, 2)
+        # Without any keys to fall back on the failure surfaces.
+        with self.assertRaises(OSError):
+            JWKSCache('stub', fetcher=fetcher).get_key('a')
+
+    # Tests keys close to the ttl are refreshed in the background
+    def test_refresh_ahead(self):
+        fetcher = StubFetcher('a')
+        cache = JWKSCache('stub', ttl=3600, refresh_ahead=300, fetcher=fetcher)
+        cache.get_key('a')
+        fetched_at = cache.fetched_at
+        fetcher.fetched.clear()
+        self.age(cache, 3400)
+
+        self.assertEqual(cache.get_key('a')['n'], 'n-a')
+        self.assertTrue(fetcher.fetched.wait(5))
+        deadline = time.monotonic() + 5
+        while cache.refreshing and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(fetcher.fetches, 2)
+        self.assertGreater(cache.fetched_at, fetched_at - 3400)
+
+
+if __name__ == '__main__':
+    unittest.main()
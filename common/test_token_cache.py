@@ -0,0 +1,52 @@
+import time
+import unittest
+
+from fsnd_common.token_cache import VerifiedTokenCache
+
+
+class VerifiedTokenCacheTestCase(unittest.TestCase):
+
+    # Tests the cache holds at most maxsize tokens, evicting the least recently used
+    def test_lru_bound(self):
+        cache = VerifiedTokenCache(maxsize=2)
+        expires_at = time.time() + 60
+        cache.put('a', 'A', expires_at)
+        cache.put('b', 'B', expires_at)
+        cache.get('a')
+        cache.put('c', 'C', expires_at)
+
+        self.assertEqual(cache.stats()['size'], 2)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual((cache.get('a'), cache.get('c')), ('A', 'C'))
+
+    # Tests an expired entry is a miss and is dropped
+    def test_expired_entry_evicted(self):
+        cache = VerifiedTokenCache()
+        cache.put('a', 'A', time.time() - 1)
+
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats()['size'], 0)
+
+    # Tests values without an expiry are never cached
+    def test_no_expiry_not_cached(self):
+        cache = VerifiedTokenCache()
+        cache.put('a', 'A', None)
+
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats()['size'], 0)
+
+    # Tests hits and misses are counted, and clear resets them
+    def test_stats(self):
+        cache = VerifiedTokenCache(maxsize=4)
+        cache.put('a', 'A', time.time() + 60)
+        cache.get('a')
+        cache.get('a')
+        cache.get('b')
+
+        self.assertEqual(cache.stats(), {'hits': 2, 'misses': 1, 'size': 1, 'maxsize': 4})
+        cache.clear()
+        self.assertEqual(cache.stats(), {'hits': 0, 'misses': 0, 'size': 0, 'maxsize': 4})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,9 +3,7 @@
 #----------------------------------------------------------------------------#
 
 import json
-import dateutil.parser
-import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for, abort
+from flask import Flask, render_template, request, Response, flash, redirect, url_for, abort, make_response
 from flask_moment import Moment
 from flask_sqlalchemy import SQLAlchemy
 import logging
@@ -13,8 +11,15 @@ from logging import Formatter, FileHandler
 from flask_wtf import Form
 from forms import *
 from flask_migrate import Migrate
-from datetime import datetime
+from datetime import datetime, timezone
 from models import app, db, Venue, Artist, Show
+from queries import has_genre, venue_directory, show_feed, venue_shows, artist_shows, with_show_counts
+from counters import roll_shows, recount_shows, show_clock
+from dates import format_datetime, format_column
+from fsnd_common.compression import install_compression
+from fsnd_common.profiling import install_profiler
+from render_cache import RenderCache
+import search
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
@@ -23,6 +28,9 @@ moment = Moment(app)
 app.config.from_object('config')
 db = SQLAlchemy(app)
 migrate = Migrate(app, db)
+install_compression(app)
+install_profiler(app)
+render_cache = RenderCache(app)
 # app.config.from_object('models')
 # TODO: connect to a local postgresql database - Done
 
@@ -31,15 +39,42 @@ migrate = Migrate(app, db)
 # Filters.
 #----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-    if isinstance(value, str):
-        date = dateutil.parser.parse(value)
-    else:
-        date = value
-    return babel.dates.format_datetime(date, format)
+# Patterns are compiled once per format and locale, see dates.py. Pages
+# listing many shows format the whole column up front with format_column.
+SHOW_TIME_FORMAT = 'full'
+SHOW_FEED_TIME_FORMAT = 'MM/dd/yyyy, HH:mm'
 
 app.jinja_env.filters['datetime'] = format_datetime
 
+#----------------------------------------------------------------------------#
+# Render cache.
+#----------------------------------------------------------------------------#
+
+# Listing and detail pages are cached under the versions of the entities
+# they show (see render_cache.py); every write handler bumps what it changes.
+# A page listing upcoming shows is only valid until the next one starts.
+
+def expires_at(next_show_start):
+    # Show times are naive UTC, see counters.show_clock().
+    if next_show_start is None:
+        return None
+    return next_show_start.replace(tzinfo=timezone.utc).timestamp()
+
+
+def genre_key(key, genre):
+    # A listing filtered by genre is cached beside the unfiltered one.
+    return '{}|genre={}'.format(key, genre) if genre else key
+
+
+def echoing_input(page):
+    # Pages that repeat what the client sent are never compressed: with
+    # attacker-chosen text compressed next to the rest of the page, the
+    # compressed size gives that page away (BREACH). no-transform keeps the
+    # compression middleware, and any proxy, from compressing it.
+    response = make_response(page)
+    response.cache_control.no_transform = True
+    return response
+
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
@@ -56,35 +91,15 @@ def index():
 def venues():
     # TODO: replace with real venues data. - Completed
     #num_shows should be aggregated based on number of upcoming shows per venue.
-    data = []
-    locations = set()
-    areas = Venue.query.all()
-    for area in areas:
-        locations.add((area.city, area.state))
-    for location in locations:
-        data.append({
-            "city": location[0],
-            "state": location[1],
-            "venues": []
-        })
-
-    for area in areas:
-        num_upcoming_shows = 0
-        shows = Show.query.filter_by(venue_id=area.id).all()
-        now = datetime.now()
-        
-        for show in shows:
-            if show.start_time > now:
-               num_upcoming_shows += 1
-
-        for location in data:
-            if area.state == location['state'] and area.city == location['city']:
-               location['venues'].append({
-                    "id": area.id,
-                    "name": area.name,
-                    "num_upcoming_shows": num_upcoming_shows
-               })
-    return render_template('pages/venues.html', areas=data)
+    # ?genre=Jazz lists only the venues with that genre.
+    genre = request.args.get('genre', '')
+    def render():
+        data = venue_directory(show_clock(), genre)
+        next_show_starts = [venue['next_show_start'] for area in data for venue in area['venues']
+                            if venue['next_show_start'] is not None]
+        return render_template('pages/venues.html', areas=data, genre=genre), expires_at(min(next_show_starts, default=None))
+    page = render_cache.get_or_render(genre_key(render_cache.key('venues', 'shows'), genre), render)
+    return echoing_input(page) if genre else page
 
 #Ready
 @app.route('/venues/search', methods=['POST'])
@@ -93,36 +108,29 @@ def search_venues():
   # seach for Hop should return "The Musical Hop".
   # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
   search_term = request.form.get('search_term', '')
-  venues = Venue.query.filter(Venue.name.ilike('%{}%'.format(search_term))).all()
-  response = {
-      "count": len(venues),
-      "data": venues
-      }
-  return render_template('pages/search_venues.html', results=response, search_term=search_term)
+  page = request.form.get('page', 1, type=int)
+  response = search.search_venues(search_term, page=max(page, 1))
+  return echoing_input(render_template('pages/search_venues.html', results=response, search_term=search_term))
 
 #Ready
 @app.route('/venues/<int:venue_id>', methods=['GET'])
 def show_venue(venue_id):
     # shows the venue page with the given venue_id
     # TODO: replace with real venue data from the venues table, using venue_id - Completed
-    venue = db.session.query(Venue).filter(Venue.id == venue_id).first()
-    # genres = venue.genres.split(",")
-
-    now = datetime.utcnow()
-    venue.upcoming_shows = (
-        db.session.query(Show)
-        .join(Venue, Show.venue_id == Venue.id)
-        .filter(Show.venue_id == venue_id, Show.start_time > now)
-        .all()
-    )
-    venue.upcoming_shows_count = len(venue.upcoming_shows)
-    venue.past_shows = (
-        db.session.query(Show)
-        .join(Venue, Show.venue_id == Venue.id)
-        .filter(Show.venue_id == venue_id, Show.start_time < now)
-        .all()
-    )    
-    return render_template('pages/show_venue.html', venue=venue)
+    def render():
+        now = show_clock()
+        row = with_show_counts(Venue, venue_id, now)
+        if row is None:
+            abort(404)
+        # genres = venue.genres.split(",")
+
+        # The show counts are the venue's counters, see counters.py.
+        venue, upcoming_shows_count, past_shows_count, next_show_start = row
+        venue.upcoming_shows, venue.past_shows = venue_shows(venue_id, now)
+        format_column(venue.upcoming_shows + venue.past_shows, 'start_time', SHOW_TIME_FORMAT)
+        return render_template('pages/show_venue.html', venue=venue, upcoming_shows_count=upcoming_shows_count,
+                               past_shows_count=past_shows_count), expires_at(next_show_start)
+    return render_cache.get_or_render(render_cache.key('venue:{}'.format(venue_id), 'artists'), render)
 
 
 #  Create Venue
@@ -159,6 +167,7 @@ def create_venue_submission():
         response["name"] = venue.name
         db.session.add(venue)
         db.session.commit()
+        render_cache.bump('venues')
     except:
         error = True
         db.session.rollback()
@@ -187,6 +196,7 @@ def delete_venue(venue_id):
         venue = Venue.query.filter_by(id=venue_id).first_or_404()
         db.session.delete(venue)
         db.session.commit()
+        render_cache.bump('venues', 'venue:{}'.format(venue_id), 'shows')
     except():
         db.session.rollback()
         error = True
@@ -208,11 +218,18 @@ def delete_venue(venue_id):
 @app.route('/artists')
 def artists():
     # TODO: replace with real data returned from querying the database
-    data = []
-    artists = Artist.query.all()
-    for artist in artists:
-        data.append(artist)
-    return render_template('pages/artists.html', artists=data)
+    # ?genre=Jazz lists only the artists with that genre.
+    genre = request.args.get('genre', '')
+    def render():
+        data = []
+        artists = Artist.query
+        if genre:
+            artists = artists.filter(has_genre(Artist, genre))
+        for artist in artists:
+            data.append(artist)
+        return render_template('pages/artists.html', artists=data, genre=genre)
+    page = render_cache.get_or_render(genre_key(render_cache.key('artists'), genre), render)
+    return echoing_input(page) if genre else page
  
 #Ready
 @app.route('/artists/search', methods=['POST'])
@@ -221,40 +238,29 @@ def search_artists():
   # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
   # search for "band" should return "The Wild Sax Band".
   search_term = request.form.get('search_term', '')
-  artists = Artist.query.filter(Artist.name.ilike('%{}%'.format(search_term))).all()
-  response = {
-      "count": len(artists),
-      "data": artists
-  }
-  return render_template('pages/search_artists.html', results=response, search_term=search_term)
+  page = request.form.get('page', 1, type=int)
+  response = search.search_artists(search_term, page=max(page, 1))
+  return echoing_input(render_template('pages/search_artists.html', results=response, search_term=search_term))
 
 #Ready
 @app.route('/artists/<int:artist_id>')
 def show_artist(artist_id):
     # shows the venue page with the given venue_id
     # TODO: replace with real venue data from the venues table, using venue_id - COMPLETED
-    artist = Artist.query.filter_by(id=artist_id).first()
-    now = datetime.utcnow()
-    artist.upcoming_shows = (
-        db.session.query(Show)
-        .join(Artist, Show.artist_id == artist_id)
-        .filter(Show.artist_id == artist_id, Show.start_time > now)
-        .all()
-    )
-    if len(artist.upcoming_shows):
-        artist.upcoming_shows_count = len(artist.upcoming_shows)
-    artist.past_shows = (
-        db.session.query(Show)
-        .join(Artist, Show.artist_id == Artist.id)
-        .filter(Show.artist_id == artist_id, Show.start_time < now)
-        .all()
-    )
-    if len(artist.past_shows):
-        artist.past_shows_count = len(artist.past_shows)
+    def render():
+        now = show_clock()
+        row = with_show_counts(Artist, artist_id, now)
+        if row is None:
+            abort(404)
 
-    print(artist.genres)
+        # The show counts are the artist's counters, see counters.py.
+        artist, upcoming_shows_count, past_shows_count, next_show_start = row
+        artist.upcoming_shows, artist.past_shows = artist_shows(artist_id, now)
+        format_column(artist.upcoming_shows + artist.past_shows, 'start_time', SHOW_TIME_FORMAT)
 
-    return render_template("pages/show_artist.html", artist=artist)    
+        return render_template("pages/show_artist.html", artist=artist, upcoming_shows_count=upcoming_shows_count,
+                               past_shows_count=past_shows_count), expires_at(next_show_start)
+    return render_cache.get_or_render(render_cache.key('artist:{}'.format(artist_id), 'venues'), render)
 
 #  Update
 #  ----------------------------------------------------------------
@@ -281,6 +287,7 @@ def edit_artist(artist_id):
 def edit_artist_submission(artist_id):
   # TODO: take values from the form submitted, and update existing
   # artist record with ID <artist_id> using the new attributes
+  render_cache.bump('artists', 'artist:{}'.format(artist_id))
 
   return redirect(url_for('show_artist', artist_id=artist_id))
 
@@ -311,6 +318,7 @@ def edit_venue(venue_id):
 def edit_venue_submission(venue_id):
   # TODO: take values from the form submitted, and update existing
   # venue record with ID <venue_id> using the new attributes
+  render_cache.bump('venues', 'venue:{}'.format(venue_id))
   return redirect(url_for('show_venue', venue_id=venue_id))
 
 #  Create Artist
@@ -346,6 +354,7 @@ def create_artist_submission():
         response["name"] = artist.name
         db.session.add(artist)
         db.session.commit()
+        render_cache.bump('artists')
     except:
         error = True
         flash("An error occurred. Artist " + name + " could not be listed.")
@@ -366,20 +375,17 @@ def shows():
     # displays list of shows at /shows
     # TODO: replace with real venues data. COMPLETED
     # num_shows should be aggregated based on number of upcoming shows per venue.
-    data = []
-    shows = Show.query.order_by(Show.start_time.desc()).all()
-    for show in shows:
-        venue = Venue.query.filter_by(id=show.venue_id).first_or_404()
-        artist = Artist.query.filter_by(id=show.artist_id).first_or_404()
-        data.extend([{
-            "venue_id": venue.id,
-            "venue_name": venue.name,
-            "artist_id": artist.id,
-            "artist_name": artist.name,
-            "artist_image_link": artist.image_link,
-            "start_time": show.start_time.strftime("%m/%d/%Y, %H:%M")
-        }])
-    return render_template('pages/shows.html', shows=data)
+    def render():
+        try:
+            data, next_cursor = show_feed(cursor=request.args.get('before'))
+        except ValueError:
+            abort(400)
+        format_column(data, 'start_time', SHOW_FEED_TIME_FORMAT)
+        return render_template('pages/shows.html', shows=data, next_cursor=next_cursor)
+    # Only the first page is cached; any string can be a cursor.
+    if request.args.get('before') is not None:
+        return render()
+    return render_cache.get_or_render(render_cache.key('shows', 'venues', 'artists'), render)
 
 
 #Ready    
@@ -407,6 +413,7 @@ def create_show_submission():
            print(show)
            db.session.add(show)
            db.session.commit()
+           render_cache.bump('shows', 'venue:{}'.format(venue_id), 'artist:{}'.format(artist_id))
             # on successful db insert, flash success
            flash('Show was successfully listed!')
            # TODO: on unsuccessful db insert, flash an error instead.
@@ -441,6 +448,26 @@ if not app.debug:
     app.logger.addHandler(file_handler)
     app.logger.info('errors')
 
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+@app.cli.command('roll-shows')
+def roll_shows_command():
+    """Moves shows that have started from the upcoming to the past counters.
+
+    Run it periodically, e.g. every few minutes from cron; pages recount
+    stale venues and artists themselves in the meantime.
+    """
+    print('{} venues and artists rolled'.format(roll_shows()))
+
+
+@app.cli.command('recount-shows')
+def recount_shows_command():
+    """Recounts the show counters of every venue and artist."""
+    recount_shows()
+    print('show counters recounted')
+
 #----------------------------------------------------------------------------#
 # Launch.
 #----------------------------------------------------------------------------#
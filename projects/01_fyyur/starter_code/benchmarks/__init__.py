@@ -0,0 +1,57 @@
+import os
+
+from flask_migrate import upgrade
+from sqlalchemy import event
+
+from models import app, db
+
+# Benchmarks seed and truncate tables, so never point them at the dev database.
+BENCH_DATABASE_URI = os.environ.get(
+    'FYYUR_BENCH_DATABASE_URL', 'postgresql://localhost:5432/fyyur_bench')
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+
+def bind_bench_db(database_uri=BENCH_DATABASE_URI):
+    """Binds the Fyyur models to the benchmark database, as it is."""
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.app = app
+    db.init_app(app)
+    return app
+
+
+def setup_bench_db(database_uri=BENCH_DATABASE_URI, revision='head'):
+    """Binds the Fyyur models to the benchmark database.
+
+    The schema is rebuilt from scratch through the migrations, up to
+    `revision`, so benchmarks measure exactly what production runs.
+    """
+    bind_bench_db(database_uri)
+    with app.app_context():
+        db.drop_all()
+        db.session.execute('DROP TABLE IF EXISTS alembic_version')
+        db.session.commit()
+        upgrade(directory=MIGRATIONS_DIR, revision=revision)
+    return app
+
+
+class QueryCounter(object):
+    """Counts, and keeps, the statements sent to the engine while the block runs."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append((statement, parameters))
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._before_cursor_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._before_cursor_execute)
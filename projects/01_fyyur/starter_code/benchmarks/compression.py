@@ -0,0 +1,69 @@
+'''
+Benchmarks response compression on rendered Fyyur pages.
+
+Renders the listing pages from a seeded catalog and reports, for each
+encoding and level, the bytes sent on the wire and the CPU time spent
+compressing, next to serving the variant from the middleware's cache.
+
+    $ export FYYUR_BENCH_DATABASE_URL=postgresql://localhost:5432/fyyur_bench
+    $ python -m benchmarks.compression --venues 1000
+'''
+import argparse
+import sys
+import time
+
+import app as fyyur
+from fsnd_common import compression
+from fsnd_common.compression import CompressionMiddleware
+from benchmarks import setup_bench_db
+from benchmarks.seed import seed
+
+PAGES = ['/venues', '/artists', '/shows']
+GZIP_LEVELS = [1, 6, 9]
+BROTLI_QUALITIES = [1, 5, 9, 11]
+
+
+def levels():
+    for level in GZIP_LEVELS:
+        yield 'gzip', level, CompressionMiddleware(None, gzip_level=level, cache_size=0)
+    if compression.brotli is None:
+        print('brotli is not installed, skipping it')
+        return
+    for quality in BROTLI_QUALITIES:
+        yield 'br', quality, CompressionMiddleware(None, brotli_quality=quality, cache_size=0)
+
+
+def measure(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def run(venues, repeat):
+    setup_bench_db()
+    with fyyur.app.app_context():
+        seed(venues=venues, artists=max(venues // 10, 1), shows_per_venue=2, recount=True)
+    client = fyyur.app.test_client()
+
+    for page in PAGES:
+        body = client.get(page).data
+        print('{}  {:.1f} KB'.format(page, len(body) / 1024))
+        for encoding, level, middleware in levels():
+            seconds, compressed = measure(lambda: middleware.compress(body, encoding), repeat)
+            print('  {:<5} {:>2}  {:8.1f} KB  {:5.1f}%  {:8.2f} ms  {:7.1f} MB/s'.format(
+                encoding, level, len(compressed) / 1024, 100.0 * len(compressed) / len(body),
+                seconds * 1000, len(body) / seconds / 2**20))
+        cached = CompressionMiddleware(None)
+        cached._compressed(body, 'gzip', None, cacheable=True)
+        seconds, _ = measure(lambda: cached._compressed(body, 'gzip', None, cacheable=True), repeat)
+        print('  {:<9}             {:>14.2f} ms'.format('cached', seconds * 1000))
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--venues', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    sys.exit(run(args.venues, args.repeat))
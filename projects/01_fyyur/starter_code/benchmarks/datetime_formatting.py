@@ -0,0 +1,66 @@
+'''
+Benchmarks formatting a column of show start times.
+
+Compares babel.dates.format_datetime per value, as the datetime filter
+used to call it, with the compiled formatter of dates.py, called per
+value and as one batch. Start times fall on a few hundred dates at a
+handful of times of day, like the shows of a busy artist. No database
+is needed.
+
+    $ python -m benchmarks.datetime_formatting --shows 1000 10000
+'''
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+
+import dates
+
+FORMATS = ['full', 'medium', 'MM/dd/yyyy, HH:mm']
+
+
+def start_times(shows, seed=0):
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    return [start + timedelta(days=rng.randint(0, 365), hours=rng.choice([18, 19, 20, 21]),
+                              minutes=rng.choice([0, 30]))
+            for _ in range(shows)]
+
+
+def measure(function):
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+
+def run(sizes):
+    print('{:<18} {:>7} {:>12} {:>12} {:>12} {:>12}'.format(
+        'format', 'shows', 'babel', 'filter', 'batch', 'iso strings'))
+    for shows in sizes:
+        values = start_times(shows)
+        strings = [value.isoformat() for value in values]
+        for format in FORMATS:
+            dates.formatter.cache_clear()
+            dates.parse_datetime.cache_clear()
+            babel_seconds, expected = measure(lambda: [babel.dates.format_datetime(value, format) for value in values])
+            filter_seconds, formatted = measure(lambda: [dates.format_datetime(value, format) for value in values])
+            batch_seconds, batch = measure(lambda: dates.format_datetimes(values, format))
+            baseline, _ = measure(lambda: [babel.dates.format_datetime(dateutil.parser.parse(value), format)
+                                           for value in strings])
+            strings_seconds, _ = measure(lambda: dates.format_datetimes(strings, format))
+            assert formatted == batch == expected
+            print('{:<18} {:>7} {:>10.1f}ms {:>10.1f}ms {:>10.1f}ms {:>5.0f}->{:.1f}ms'.format(
+                format, shows, babel_seconds * 1000, filter_seconds * 1000, batch_seconds * 1000,
+                baseline * 1000, strings_seconds * 1000))
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shows', nargs='+', type=int, default=[1000, 10000])
+    args = parser.parse_args()
+    sys.exit(run(args.shows))
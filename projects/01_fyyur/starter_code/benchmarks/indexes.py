@@ -0,0 +1,109 @@
+'''
+Benchmarks the hot Fyyur lookups before and after the lookup indexes.
+
+Builds the schema at head, seeds a large catalog, drops the indexes the
+lookup-index migration (8f730039d27f) added and runs EXPLAIN ANALYZE on
+the statements the controllers send. It then recreates the indexes and
+runs them again. Both runs use today's queries on today's schema, so the
+indexes are the only difference.
+
+    $ export FYYUR_BENCH_DATABASE_URL=postgresql://localhost:5432/fyyur_bench
+    $ python -m benchmarks.indexes --venues 100000
+'''
+import argparse
+import json
+import sys
+
+from models import db, Venue, Artist, Show
+from queries import venue_directory, show_feed, venue_shows, artist_shows
+from benchmarks import setup_bench_db, QueryCounter
+from benchmarks.seed import seed
+
+# The indexes added by migration 8f730039d27f.
+LOOKUP_INDEXES = [
+    'ix_Show_venue_id_start_time', 'ix_Show_artist_id_start_time', 'ix_Show_start_time_id',
+    'ix_Venue_city_state', 'ix_Venue_name_trgm', 'ix_Artist_name_trgm',
+]
+SEARCH_TERM = 'Musical'
+
+SCENARIOS = [
+    ('venue directory', lambda: venue_directory()),
+    ('show feed', lambda: show_feed()),
+    ('venue detail shows', lambda: venue_shows(1)),
+    ('artist detail shows', lambda: artist_shows(1)),
+    ('venue name search', lambda: Venue.query.filter(Venue.name.ilike('%{}%'.format(SEARCH_TERM))).all()),
+    ('artist name search', lambda: Artist.query.filter(Artist.name.ilike('%{}%'.format(SEARCH_TERM))).all()),
+]
+
+
+def _scan_types(plan):
+    nodes = [plan['Node Type'] + (' on ' + plan['Relation Name'] if 'Relation Name' in plan else '')]
+    for child in plan.get('Plans', []):
+        nodes.extend(_scan_types(child))
+    return [node for node in nodes if 'Scan' in node]
+
+
+def explain(statement, parameters):
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.execute('EXPLAIN (ANALYZE, FORMAT JSON) ' + statement, parameters)
+        plan = cursor.fetchone()[0]
+    finally:
+        cursor.close()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]
+
+
+def lookup_indexes():
+    indexes = {index.name: index for model in (Show, Venue, Artist) for index in model.__table__.indexes}
+    return [indexes[name] for name in LOOKUP_INDEXES]
+
+
+def analyze():
+    db.session.execute('ANALYZE')
+    db.session.commit()
+
+
+def measure():
+    results = {}
+    for name, scenario in SCENARIOS:
+        with QueryCounter(db.engine) as counter:
+            scenario()
+        plans = [explain(statement, parameters) for statement, parameters in counter.statements]
+        results[name] = {
+            'execution_ms': sum(plan['Execution Time'] for plan in plans),
+            'scans': [scan for plan in plans for scan in _scan_types(plan['Plan'])],
+        }
+        db.session.remove()
+    return results
+
+
+def run(venues, artists, shows_per_venue):
+    app = setup_bench_db()
+    with app.app_context():
+        seed(venues=venues, artists=artists, shows_per_venue=shows_per_venue, recount=True)
+        for index in lookup_indexes():
+            index.drop(db.session.connection())
+        analyze()
+        before = measure()
+
+        for index in lookup_indexes():
+            index.create(db.session.connection())
+        analyze()
+        after = measure()
+
+    for name, _ in SCENARIOS:
+        print(name)
+        print('  before {:10.2f} ms  {}'.format(before[name]['execution_ms'], ', '.join(before[name]['scans'])))
+        print('  after  {:10.2f} ms  {}'.format(after[name]['execution_ms'], ', '.join(after[name]['scans'])))
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--venues', type=int, default=100000)
+    parser.add_argument('--artists', type=int, default=20000)
+    parser.add_argument('--shows-per-venue', type=int, default=10)
+    args = parser.parse_args()
+    sys.exit(run(args.venues, args.artists, args.shows_per_venue))
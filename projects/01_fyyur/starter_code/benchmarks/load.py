@@ -0,0 +1,63 @@
+'''
+Load test replaying a mix of the hot Fyyur pages.
+
+Seeds a deterministic catalog, then sends a weighted mix of listing,
+detail, genre and search requests and prints p50/p95/p99 latency, throughput
+and peak RSS per endpoint as JSON. Ten million rows is, for example,
+--venues 2000000 --artists 200000 --shows-per-venue 4.
+
+    $ export FYYUR_BENCH_DATABASE_URL=postgresql://localhost:5432/fyyur_bench
+    $ python -m benchmarks.load --venues 10000 --requests 2000 --output load.json
+'''
+import argparse
+import sys
+from urllib.parse import urlencode
+
+import app as fyyur
+from benchmarks import bind_bench_db, setup_bench_db
+from fsnd_common.loadtest import Endpoint, Request, add_arguments, post_form, run_mix, write_results
+from benchmarks.seed import GENRES, WORDS, seed
+
+
+def endpoints(venues, artists):
+    return [
+        Endpoint('GET /venues', 3, lambda rng: Request('GET', '/venues')),
+        Endpoint('GET /artists', 2, lambda rng: Request('GET', '/artists')),
+        Endpoint('GET /venues?genre=', 2,
+                 lambda rng: Request('GET', '/venues?' + urlencode({'genre': rng.choice(GENRES)}))),
+        Endpoint('GET /artists?genre=', 2,
+                 lambda rng: Request('GET', '/artists?' + urlencode({'genre': rng.choice(GENRES)}))),
+        Endpoint('GET /shows', 3, lambda rng: Request('GET', '/shows')),
+        Endpoint('GET /venues/<id>', 4, lambda rng: Request('GET', '/venues/{}'.format(rng.randint(1, venues)))),
+        Endpoint('GET /artists/<id>', 4, lambda rng: Request('GET', '/artists/{}'.format(rng.randint(1, artists)))),
+        Endpoint('POST /venues/search', 2,
+                 lambda rng: post_form('/venues/search', {'search_term': rng.choice(WORDS)})),
+        Endpoint('POST /artists/search', 2,
+                 lambda rng: post_form('/artists/search', {'search_term': rng.choice(WORDS)})),
+    ]
+
+
+def run(args):
+    artists = args.artists or max(args.venues // 10, 1)
+    if args.skip_seed:
+        bind_bench_db()
+    else:
+        setup_bench_db()
+        with fyyur.app.app_context():
+            seed(venues=args.venues, artists=artists, shows_per_venue=args.shows_per_venue, seed=args.seed, recount=True)
+    scale = {'venues': args.venues, 'artists': artists, 'shows': args.venues * args.shows_per_venue}
+    results = run_mix(fyyur.app, endpoints(args.venues, artists), args.requests, seed=args.seed,
+                      warmup=args.warmup, server=args.server, scale=scale, name='fyyur')
+    write_results(results, args.output)
+    return 1 if results['total']['errors'] else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--venues', type=int, default=1000)
+    parser.add_argument('--artists', type=int, help='defaults to a tenth of the venues')
+    parser.add_argument('--shows-per-venue', type=int, default=4)
+    parser.add_argument('--skip-seed', action='store_true',
+                        help='reuse the catalog a previous run seeded with the same sizes')
+    add_arguments(parser)
+    sys.exit(run(parser.parse_args()))
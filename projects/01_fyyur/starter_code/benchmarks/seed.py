@@ -0,0 +1,103 @@
+import random
+from datetime import timedelta
+from itertools import islice
+
+from counters import recount_shows, show_clock
+from models import db, Venue, Artist, Show
+
+CITIES = [
+    ('San Francisco', 'CA'), ('New York', 'NY'), ('Austin', 'TX'),
+    ('Seattle', 'WA'), ('Chicago', 'IL'), ('New Orleans', 'LA'),
+    ('Nashville', 'TN'), ('Denver', 'CO'), ('Portland', 'OR'), ('Boston', 'MA'),
+]
+GENRES = ['Jazz', 'Reggae', 'Swing', 'Classical', 'Folk', 'Rock n Roll', 'Blues', 'Hip-Hop']
+WORDS = ['Musical', 'Hop', 'Park', 'Square', 'Live', 'Dueling', 'Pianos', 'Bar',
+         'Wild', 'Sax', 'Band', 'Petals', 'Guns', 'Coffee', 'Hall', 'Lounge']
+BATCH_SIZE = 5000
+
+
+def _name(rng, index):
+    return '{} {} {}'.format(rng.choice(WORDS), rng.choice(WORDS), index)
+
+
+def _insert(table, rows):
+    """Inserts rows, any iterable of dicts, BATCH_SIZE at a time, so a
+    generator never holds more than one batch in memory."""
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, BATCH_SIZE))
+        if not batch:
+            return
+        db.session.execute(table.insert(), batch)
+
+
+def truncate():
+    db.session.execute('TRUNCATE "Show", "Venue", "Artist" RESTART IDENTITY')
+    db.session.commit()
+
+
+#----------------------------------------------------------------------------#
+# Row generators.
+#----------------------------------------------------------------------------#
+
+def venue_rows(rng, venues):
+    for i in range(1, venues + 1):
+        city, state = rng.choice(CITIES)
+        yield {
+            'id': i,
+            'name': _name(rng, i),
+            'city': city,
+            'state': state,
+            'address': '{} Folsom Street'.format(i),
+            'phone': '123-123-1234',
+            'genres': rng.sample(GENRES, 2),
+        }
+
+
+def artist_rows(rng, artists):
+    for i in range(1, artists + 1):
+        city, state = rng.choice(CITIES)
+        yield {
+            'id': i,
+            'name': _name(rng, i),
+            'city': city,
+            'state': state,
+            'phone': '326-123-5000',
+            'genres': rng.sample(GENRES, 2),
+        }
+
+
+def show_rows(rng, venues, artists, shows_per_venue, now):
+    for venue_id in range(1, venues + 1):
+        for n in range(shows_per_venue):
+            days = rng.randint(1, 365) * (1 if n % 2 else -1)
+            yield {
+                'venue_id': venue_id,
+                'artist_id': rng.randint(1, artists),
+                'start_time': now + timedelta(days=days),
+            }
+
+
+def seed(venues, artists, shows_per_venue, seed=0, now=None, recount=False):
+    """Fills the benchmark database with a deterministic synthetic catalog.
+
+    Half of each venue's shows are in the past and half in the future
+    relative to `now`, so both the upcoming and past code paths do work.
+    Rows are generated as they are inserted, so the catalog can be far
+    larger than memory; the same seed always produces the same rows.
+
+    The inserts bypass the ORM, which leaves the show counters at zero.
+    Pass recount=True to recount them last; that needs a schema with the
+    counter columns, so it is off for runs against older revisions.
+    """
+    rng = random.Random(seed)
+    now = now or show_clock()
+    truncate()
+    _insert(Venue.__table__, venue_rows(rng, venues))
+    _insert(Artist.__table__, artist_rows(rng, artists))
+    _insert(Show.__table__, show_rows(rng, venues, artists, shows_per_venue, now))
+    db.session.execute("SELECT setval(pg_get_serial_sequence('\"Venue\"', 'id'), {})".format(venues))
+    db.session.execute("SELECT setval(pg_get_serial_sequence('\"Artist\"', 'id'), {})".format(artists))
+    db.session.commit()
+    if recount:
+        recount_shows()
@@ -0,0 +1,53 @@
+'''
+Benchmarks the /venues directory query.
+
+Seeds catalogs of growing size and checks that building the directory
+always costs the same number of queries.
+
+    $ export FYYUR_BENCH_DATABASE_URL=postgresql://localhost:5432/fyyur_bench
+    $ python -m benchmarks.venue_directory --sizes 100 1000 10000 50000
+'''
+import argparse
+import sys
+import time
+
+from models import db
+from queries import venue_directory
+from benchmarks import setup_bench_db, QueryCounter
+from benchmarks.seed import seed
+
+SIZES = [100, 1000, 10000, 50000]
+SHOWS_PER_VENUE = 4
+REPEAT = 5
+
+
+def run(sizes=SIZES):
+    app = setup_bench_db()
+    results = []
+    with app.app_context():
+        for venues in sizes:
+            seed(venues=venues, artists=max(venues // 10, 1), shows_per_venue=SHOWS_PER_VENUE, recount=True)
+            timings = []
+            for _ in range(REPEAT):
+                with QueryCounter(db.engine) as counter:
+                    start = time.perf_counter()
+                    areas = venue_directory()
+                    timings.append(time.perf_counter() - start)
+                db.session.remove()
+            listed = sum(len(area['venues']) for area in areas)
+            assert listed == venues, (listed, venues)
+            results.append((venues, counter.count, min(timings)))
+            print('{:>8} venues  {:>3} queries  {:8.1f} ms'.format(
+                venues, counter.count, min(timings) * 1000))
+    query_counts = set(count for _, count, _ in results)
+    if len(query_counts) != 1:
+        print('query count grows with venue count: {}'.format(sorted(query_counts)))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', nargs='+', type=int, default=SIZES)
+    args = parser.parse_args()
+    sys.exit(run(args.sizes))
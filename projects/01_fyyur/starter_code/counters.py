@@ -0,0 +1,145 @@
+from datetime import datetime
+
+from sqlalchemy import and_, case, event, func, inspect, or_, select
+
+from models import db, Venue, Artist, Show
+
+# Each counted model with the Show column pointing at it.
+COUNTED = ((Venue, 'venue_id'), (Artist, 'artist_id'))
+
+#----------------------------------------------------------------------------#
+# Upcoming and past show counters.
+#
+# Venue and Artist rows carry upcoming_shows_count, past_shows_count and
+# next_show_start. Inserting or deleting a Show adjusts the counters of
+# its venue and artist in the same transaction. Counts only go stale with
+# time, once next_show_start passes: roll_shows() recounts just those
+# rows, from a periodic `flask roll-shows`, and readers can recount stale
+# rows inline with upcoming_shows_count() and next_show_start(). Requests
+# never write the counters themselves.
+#
+# Show times are naive UTC, as on the detail pages.
+#----------------------------------------------------------------------------#
+
+def show_clock():
+    return datetime.utcnow()
+
+
+def _shows_of(model, key, column, *criteria):
+    shows = Show.__table__
+    return (select(column).select_from(shows)
+            .where(and_(shows.c[key] == model.__table__.c.id, *criteria))
+            .scalar_subquery())
+
+
+def upcoming_shows_count(model, now):
+    """A column expression for the upcoming show count of each row; rows
+    whose counters went stale are counted from Show instead."""
+    shows = Show.__table__
+    recount = _shows_of(model, dict(COUNTED)[model], func.count(), shows.c.start_time > now)
+    return case((model.next_show_start <= now, recount), else_=model.upcoming_shows_count)
+
+
+def past_shows_count(model, now):
+    """A column expression for the past show count of each row, counted
+    from Show for rows whose counters went stale."""
+    shows = Show.__table__
+    recount = _shows_of(model, dict(COUNTED)[model], func.count(), shows.c.start_time <= now)
+    return case((model.next_show_start <= now, recount), else_=model.past_shows_count)
+
+
+def next_show_start(model, now):
+    """A column expression for the start of each row's next show, looked
+    up in Show for rows whose counters went stale."""
+    shows = Show.__table__
+    recount = _shows_of(model, dict(COUNTED)[model], func.min(shows.c.start_time), shows.c.start_time > now)
+    return case((model.next_show_start <= now, recount), else_=model.next_show_start)
+
+
+def _recount(connection, model, key, now, criterion=None):
+    table, shows = model.__table__, Show.__table__
+    statement = table.update().values(
+        upcoming_shows_count=_shows_of(model, key, func.count(), shows.c.start_time > now),
+        past_shows_count=_shows_of(model, key, func.count(), shows.c.start_time <= now),
+        next_show_start=_shows_of(model, key, func.min(shows.c.start_time), shows.c.start_time > now))
+    if criterion is not None:
+        statement = statement.where(criterion)
+    return connection.execute(statement).rowcount
+
+
+def roll_shows(now=None):
+    """Recounts the venues and artists whose next show has started since
+    they were counted, and commits. Returns how many rows were rolled."""
+    now = now or show_clock()
+    connection = db.session.connection()
+    rolled = sum(_recount(connection, model, key, now, model.__table__.c.next_show_start <= now)
+                 for model, key in COUNTED)
+    db.session.commit()
+    return rolled
+
+
+def recount_shows(now=None):
+    """Recounts every venue and artist from scratch, e.g. after shows were
+    written without the ORM, and commits."""
+    now = now or show_clock()
+    connection = db.session.connection()
+    for model, key in COUNTED:
+        _recount(connection, model, key, now)
+    db.session.commit()
+
+#----------------------------------------------------------------------------#
+# Maintenance on Show writes.
+#----------------------------------------------------------------------------#
+
+def _adjust(connection, show, delta):
+    start_time = show.start_time
+    if start_time is None:
+        return
+    if not isinstance(start_time, datetime):
+        # Submitted as a string, so the database has the only parsed value.
+        _recount_show(connection, [show.venue_id], [show.artist_id])
+        return
+    now = show_clock()
+    for model, key in COUNTED:
+        table = model.__table__
+        if start_time > now:
+            values = {'upcoming_shows_count': table.c.upcoming_shows_count + delta}
+            if delta > 0:
+                values['next_show_start'] = case(
+                    (or_(table.c.next_show_start.is_(None), table.c.next_show_start > start_time), start_time),
+                    else_=table.c.next_show_start)
+            # A deleted next show leaves next_show_start early, which only
+            # costs a recount when it passes.
+        else:
+            values = {'past_shows_count': table.c.past_shows_count + delta}
+        connection.execute(table.update().where(table.c.id == getattr(show, key)).values(values))
+
+
+def _recount_show(connection, venue_ids, artist_ids):
+    now = show_clock()
+    for (model, key), ids in zip(COUNTED, (venue_ids, artist_ids)):
+        ids = [id for id in ids if id is not None]
+        if ids:
+            _recount(connection, model, key, now, model.__table__.c.id.in_(ids))
+
+
+@event.listens_for(Show, 'after_insert')
+def _count_inserted_show(mapper, connection, show):
+    _adjust(connection, show, 1)
+
+
+@event.listens_for(Show, 'after_delete')
+def _count_deleted_show(mapper, connection, show):
+    _adjust(connection, show, -1)
+
+
+@event.listens_for(Show, 'after_update')
+def _count_updated_show(mapper, connection, show):
+    # A moved or rescheduled show is recounted on both its old and new
+    # venue and artist.
+    state = inspect(show)
+    if not any(state.attrs[name].history.has_changes() for name in ('start_time', 'venue_id', 'artist_id')):
+        return
+    venue_ids = set(state.attrs.venue_id.history.sum())
+    artist_ids = set(state.attrs.artist_id.history.sum())
+    _recount_show(connection, venue_ids | {show.venue_id}, artist_ids | {show.artist_id})
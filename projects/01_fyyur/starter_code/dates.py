@@ -0,0 +1,142 @@
+import re
+from collections.abc import Hashable
+from functools import lru_cache
+
+import dateutil.parser
+from babel import Locale
+from babel.dates import (LC_TIME, UTC, DateTimeFormat, get_date_format, get_datetime_format,
+                         get_time_format, parse_pattern)
+
+NAMED_FORMATS = ('full', 'long', 'medium', 'short')
+PARSE_CACHE_SIZE = 4096
+PARTS_CACHE_SIZE = 4096
+
+# Pattern fields by what they depend on: the calendar date, the time of
+# day, or the timezone and its offset at that moment.
+DATE_FIELDS = frozenset('GyYuUQqMLlwWdDFgEec')
+TIME_FIELDS = frozenset('abBhHKkmsSA')
+ZONE_FIELDS = frozenset('zZOvVxX')
+
+#----------------------------------------------------------------------------#
+# Datetime formatting.
+#----------------------------------------------------------------------------#
+
+class DatetimeFormatter(object):
+    """A babel date/time pattern compiled for one locale.
+
+    Formatting goes field by field in babel, with locale lookups for every
+    name. Here the fields are split by what they depend on and each group
+    is computed once per distinct date, time of day and timezone offset,
+    so a column of thousands of shows, which share a few hundred dates and
+    a handful of start times, mostly costs dictionary lookups.
+    """
+
+    def __init__(self, pattern, locale):
+        self.pattern = pattern
+        self.locale = locale
+        fields = re.findall(r'%\((\w+)\)s', pattern.format)
+        self.date_fields = [name for name in fields if name[0] in DATE_FIELDS]
+        self.time_fields = [name for name in fields if name[0] in TIME_FIELDS]
+        self.zone_fields = [name for name in fields if name[0] in ZONE_FIELDS]
+        self.other_fields = [name for name in fields
+                             if name[0] not in DATE_FIELDS | TIME_FIELDS | ZONE_FIELDS]
+        self.date_parts = {}
+        self.time_parts = {}
+        self.zone_parts = {}
+
+    def __call__(self, value):
+        if isinstance(value, str):
+            value = parse_datetime(value)
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=UTC)
+        parts = {}
+        if self.date_fields:
+            parts.update(self._parts(self.date_parts, value.date(), self.date_fields, value))
+        if self.time_fields:
+            parts.update(self._parts(self.time_parts, value.time(), self.time_fields, value))
+        if self.zone_fields:
+            if isinstance(value.tzinfo, Hashable):
+                parts.update(self._parts(self.zone_parts, (value.tzinfo, value.utcoffset(), value.dst()),
+                                         self.zone_fields, value))
+            else:
+                # Some tzinfo classes, dateutil's among them, can't be keys.
+                parts.update(self._fields(value, self.zone_fields))
+        if self.other_fields:
+            parts.update(self._fields(value, self.other_fields))
+        return self.pattern.format % parts
+
+    def _fields(self, value, names):
+        fields = DateTimeFormat(value, self.locale)
+        return {name: fields[name] for name in names}
+
+    def _parts(self, cache, key, names, value):
+        parts = cache.get(key)
+        if parts is None:
+            parts = self._fields(value, names)
+            if len(cache) >= PARTS_CACHE_SIZE:
+                cache.clear()
+            cache[key] = parts
+        return parts
+
+
+@lru_cache(maxsize=None)
+def formatter(format='medium', locale=LC_TIME):
+    """Returns the DatetimeFormatter for a format and locale, compiled once.
+
+    A named format ('full', 'long', 'medium', 'short') is expanded into a
+    single pattern joining the locale's date and time patterns the way
+    babel.dates.format_datetime does.
+    """
+    locale = Locale.parse(locale)
+    if format in NAMED_FORMATS:
+        pieces = re.split(r'(\{[01]\})', get_datetime_format(format, locale=locale).replace("'", ''))
+        format = ''.join(
+            get_time_format(format, locale=locale).pattern if piece == '{0}' else
+            get_date_format(format, locale=locale).pattern if piece == '{1}' else
+            _quote(piece)
+            for piece in pieces)
+    return DatetimeFormatter(parse_pattern(format), locale)
+
+
+def _quote(literal):
+    return "'{}'".format(literal.replace("'", "''")) if literal else ''
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_datetime(value):
+    """dateutil.parser.parse, memoized: pages repeat the same strings."""
+    return dateutil.parser.parse(value)
+
+
+def format_datetime(value, format='medium', locale=None):
+    """Formats a datetime, or a string dateutil can parse, like
+    babel.dates.format_datetime. Naive datetimes are taken as UTC."""
+    return formatter(format, locale or LC_TIME)(value)
+
+
+def format_datetimes(values, format='medium', locale=None):
+    """Formats a whole column of datetimes at once, looking the formatter
+    up once and formatting each distinct value only once."""
+    format_value = formatter(format, locale or LC_TIME)
+    formatted = {}
+    result = []
+    for value in values:
+        key = value
+        if not isinstance(value, str) and value.tzinfo is not None:
+            # Aware datetimes are equal across zones when they are the same
+            # instant, but don't format the same.
+            key = (value.replace(tzinfo=None), id(value.tzinfo), value.utcoffset())
+        text = formatted.get(key)
+        if text is None:
+            text = formatted[key] = format_value(value)
+        result.append(text)
+    return result
+
+
+def format_column(rows, key, format='medium', locale=None, into=None):
+    """Formats row[key] of every dict in rows into row[into], by default
+    'formatted_' + key, and returns the rows."""
+    into = into or 'formatted_' + key
+    for row, text in zip(rows, format_datetimes([row[key] for row in rows], format, locale)):
+        row[into] = text
+    return rows
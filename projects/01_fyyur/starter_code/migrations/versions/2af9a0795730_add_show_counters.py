@@ -0,0 +1,51 @@
+"""add show counters
+
+Revision ID: 2af9a0795730
+Revises: c81a399e587b
+Create Date: 2026-10-18 15:02:47.913204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2af9a0795730'
+down_revision = 'c81a399e587b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('Venue', sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('Venue', sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('Venue', sa.Column('next_show_start', sa.DateTime(), nullable=True))
+    op.create_index('ix_Venue_next_show_start', 'Venue', ['next_show_start'], unique=False)
+    op.add_column('Artist', sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('Artist', sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('Artist', sa.Column('next_show_start', sa.DateTime(), nullable=True))
+    op.create_index('ix_Artist_next_show_start', 'Artist', ['next_show_start'], unique=False)
+
+    # Count the shows already there. Show times are naive UTC, like
+    # counters.show_clock(); from here on counters.py keeps them current.
+    for table, key in (('Venue', 'venue_id'), ('Artist', 'artist_id')):
+        op.execute('''
+            UPDATE "{table}" SET
+                upcoming_shows_count = (SELECT count(*) FROM "Show"
+                    WHERE "Show".{key} = "{table}".id AND start_time > timezone('utc', now())),
+                past_shows_count = (SELECT count(*) FROM "Show"
+                    WHERE "Show".{key} = "{table}".id AND start_time <= timezone('utc', now())),
+                next_show_start = (SELECT min(start_time) FROM "Show"
+                    WHERE "Show".{key} = "{table}".id AND start_time > timezone('utc', now()))
+        '''.format(table=table, key=key))
+
+
+def downgrade():
+    op.drop_index('ix_Artist_next_show_start', table_name='Artist')
+    op.drop_column('Artist', 'next_show_start')
+    op.drop_column('Artist', 'past_shows_count')
+    op.drop_column('Artist', 'upcoming_shows_count')
+    op.drop_index('ix_Venue_next_show_start', table_name='Venue')
+    op.drop_column('Venue', 'next_show_start')
+    op.drop_column('Venue', 'past_shows_count')
+    op.drop_column('Venue', 'upcoming_shows_count')
@@ -0,0 +1,66 @@
+"""index genres
+
+Revision ID: 60d155a18f68
+Revises: 2af9a0795730
+Create Date: 2026-10-18 16:21:09.571842
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '60d155a18f68'
+down_revision = '2af9a0795730'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Artist genres become an array like Venue genres. The old strings are
+    # either array literals ('{Jazz,"Rock n Roll"}', from a submitted form)
+    # or comma separated ('Jazz, Blues').
+    op.drop_index('ix_Artist_search_trgm', table_name='Artist')
+    op.execute('DROP FUNCTION fyyur_artist_document(text, text, text, text)')
+    op.alter_column('Artist', 'genres',
+               existing_type=sa.String(length=120),
+               type_=sa.ARRAY(sa.String()),
+               existing_nullable=True,
+               postgresql_using=r'''CASE
+                   WHEN left(genres, 1) = '{' THEN genres::varchar[]
+                   ELSE regexp_split_to_array(NULLIF(btrim(genres), ''), '\s*,\s*')::varchar[]
+               END''')
+    op.execute('''
+        CREATE OR REPLACE FUNCTION fyyur_artist_document(name text, city text, state text, genres text[])
+        RETURNS text LANGUAGE sql IMMUTABLE AS
+        $$ SELECT concat_ws(' ', name, city, state, array_to_string(genres, ' ')) $$
+    ''')
+    op.execute('''
+        CREATE INDEX "ix_Artist_search_trgm" ON "Artist"
+        USING gin (fyyur_artist_document(name, city, state, genres) gin_trgm_ops)
+    ''')
+
+    # genres @> ARRAY['Jazz'] lookups, see queries.has_genre().
+    op.create_index('ix_Venue_genres', 'Venue', ['genres'], unique=False, postgresql_using='gin')
+    op.create_index('ix_Artist_genres', 'Artist', ['genres'], unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    op.drop_index('ix_Artist_genres', table_name='Artist')
+    op.drop_index('ix_Venue_genres', table_name='Venue')
+    op.drop_index('ix_Artist_search_trgm', table_name='Artist')
+    op.execute('DROP FUNCTION fyyur_artist_document(text, text, text, text[])')
+    op.alter_column('Artist', 'genres',
+               existing_type=sa.ARRAY(sa.String()),
+               type_=sa.String(length=120),
+               existing_nullable=True,
+               postgresql_using="array_to_string(genres, ',')")
+    op.execute('''
+        CREATE OR REPLACE FUNCTION fyyur_artist_document(name text, city text, state text, genres text)
+        RETURNS text LANGUAGE sql IMMUTABLE AS
+        $$ SELECT concat_ws(' ', name, city, state, genres) $$
+    ''')
+    op.execute('''
+        CREATE INDEX "ix_Artist_search_trgm" ON "Artist"
+        USING gin (fyyur_artist_document(name, city, state, genres) gin_trgm_ops)
+    ''')
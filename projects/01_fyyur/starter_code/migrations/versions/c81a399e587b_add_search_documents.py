@@ -0,0 +1,47 @@
+"""add search documents
+
+Revision ID: c81a399e587b
+Revises: 8f730039d27f
+Create Date: 2026-10-18 11:40:05.219377
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c81a399e587b'
+down_revision = '8f730039d27f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The search documents concatenate name, city, state and genres. They are
+    # wrapped in IMMUTABLE functions so they can back expression indexes, and
+    # search.py filters on the very same expressions so the planner uses them.
+    op.execute('''
+        CREATE OR REPLACE FUNCTION fyyur_venue_document(name text, city text, state text, genres text[])
+        RETURNS text LANGUAGE sql IMMUTABLE AS
+        $$ SELECT concat_ws(' ', name, city, state, array_to_string(genres, ' ')) $$
+    ''')
+    op.execute('''
+        CREATE OR REPLACE FUNCTION fyyur_artist_document(name text, city text, state text, genres text)
+        RETURNS text LANGUAGE sql IMMUTABLE AS
+        $$ SELECT concat_ws(' ', name, city, state, genres) $$
+    ''')
+    op.execute('''
+        CREATE INDEX "ix_Venue_search_trgm" ON "Venue"
+        USING gin (fyyur_venue_document(name, city, state, genres) gin_trgm_ops)
+    ''')
+    op.execute('''
+        CREATE INDEX "ix_Artist_search_trgm" ON "Artist"
+        USING gin (fyyur_artist_document(name, city, state, genres) gin_trgm_ops)
+    ''')
+
+
+def downgrade():
+    op.drop_index('ix_Artist_search_trgm', table_name='Artist')
+    op.drop_index('ix_Venue_search_trgm', table_name='Venue')
+    op.execute('DROP FUNCTION fyyur_artist_document(text, text, text, text)')
+    op.execute('DROP FUNCTION fyyur_venue_document(text, text, text, text[])')
@@ -1,6 +1,11 @@
+import json
+import sqlite3
+
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
+from sqlalchemy import DDL, event
+from sqlalchemy.engine import Engine
 
 
 app = Flask(__name__)
@@ -23,10 +28,25 @@ class Venue(db.Model):
     seeking_talent = db.Column(db.Boolean, default=False, nullable=True)
     seeking_description = db.Column(db.String(), default='Not currently seeking performance venues', nullable=True)
     image_link = db.Column(db.String(500))
-    genres = db.Column(db.ARRAY(db.String()))
+    # Genres are an array on both models, GIN indexed for genre browsing
+    # (queries.has_genre); SQLite test databases store them as JSON.
+    genres = db.Column(db.ARRAY(db.String()).with_variant(db.JSON(), 'sqlite'))
     facebook_link = db.Column(db.String(120))
     venue_shows = db.relationship('Show', backref='Venue', lazy=True, cascade='all, delete-orphan')
+    # Show counters, maintained by counters.py. They are exact until
+    # next_show_start passes, when the next upcoming show becomes past.
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    next_show_start = db.Column(db.DateTime())
 
+    __table_args__ = (
+        db.Index('ix_Venue_city_state', 'city', 'state'),
+        db.Index('ix_Venue_next_show_start', 'next_show_start'),
+        db.Index('ix_Venue_genres', 'genres', postgresql_using='gin'),
+        db.Index('ix_Venue_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_Venue_search_trgm', db.func.fyyur_venue_document(name, city, state, genres).label('document'),
+                 postgresql_using='gin', postgresql_ops={'document': 'gin_trgm_ops'}),
+    )
     
     def __repr__(self):
         return f'<Venue {self.id} {self.name}>'
@@ -40,13 +60,25 @@ class Artist(db.Model):
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column(db.String(120))
+    genres = db.Column(db.ARRAY(db.String()).with_variant(db.JSON(), 'sqlite'))
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     website = db.Column(db.String(200))
     seeking_venue = db.Column(db.String())
     seeking_description = db.Column(db.String(1000))
     artist_shows = db.relationship('Show', backref='Artist', lazy=True, cascade='all, delete-orphan')
+    # Show counters, see Venue.
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    next_show_start = db.Column(db.DateTime())
+
+    __table_args__ = (
+        db.Index('ix_Artist_next_show_start', 'next_show_start'),
+        db.Index('ix_Artist_genres', 'genres', postgresql_using='gin'),
+        db.Index('ix_Artist_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_Artist_search_trgm', db.func.fyyur_artist_document(name, city, state, genres).label('document'),
+                 postgresql_using='gin', postgresql_ops={'document': 'gin_trgm_ops'}),
+    )
 
     def __repr__(self):
         return f'<Artist {self.id} {self.name}>'
@@ -62,5 +94,42 @@ class Show(db.Model):
   venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'), nullable=False)
   artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id'), nullable=False)
 
+  __table_args__ = (
+      db.Index('ix_Show_venue_id_start_time', 'venue_id', 'start_time'),
+      db.Index('ix_Show_artist_id_start_time', 'artist_id', 'start_time'),
+      db.Index('ix_Show_start_time_id', 'start_time', 'id'),
+  )
+
   def __repr__(self):
-        return f'<Show {self.id} {self.start_time}>'
\ No newline at end of file
+        return f'<Show {self.id} {self.start_time}>'
+
+#----------------------------------------------------------------------------#
+# Search documents.
+#
+# The ix_*_search_trgm indexes are built on the search document functions of
+# the migrations (see search.py). create_all() creates them first on Postgres,
+# and SQLite test databases get the same functions in Python.
+#----------------------------------------------------------------------------#
+
+def search_document(name, city, state, genres):
+    if isinstance(genres, str):
+        genres = json.loads(genres)
+    # concat_ws() skips NULLs only.
+    genres = ' '.join(genres) if genres is not None else None
+    return ' '.join(field for field in (name, city, state, genres) if field is not None)
+
+
+event.listen(db.metadata, 'before_create', DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql'))
+for _document in ('fyyur_venue_document', 'fyyur_artist_document'):
+    event.listen(db.metadata, 'before_create', DDL('''
+        CREATE OR REPLACE FUNCTION {}(name text, city text, state text, genres text[])
+        RETURNS text LANGUAGE sql IMMUTABLE AS
+        $$ SELECT concat_ws(' ', name, city, state, array_to_string(genres, ' ')) $$
+    '''.format(_document)).execute_if(dialect='postgresql'))
+
+
+@event.listens_for(Engine, 'connect')
+def _register_search_documents(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        for document in ('fyyur_venue_document', 'fyyur_artist_document'):
+            dbapi_connection.create_function(document, 4, search_document, deterministic=True)
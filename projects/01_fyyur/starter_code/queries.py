@@ -0,0 +1,168 @@
+from bisect import bisect_right
+from datetime import datetime
+from itertools import groupby
+
+from sqlalchemy import String, cast, exists, func, literal_column, select, tuple_
+from sqlalchemy.dialects.postgresql import ARRAY, array
+
+from counters import next_show_start, past_shows_count, show_clock, upcoming_shows_count
+from models import db, Venue, Artist, Show
+
+SHOWS_PER_PAGE = 30
+
+#----------------------------------------------------------------------------#
+# Read queries shared by the controllers.
+#----------------------------------------------------------------------------#
+
+def has_genre(model, genre):
+    """A criterion matching the venues or artists listing genre.
+
+    On Postgres it is `genres @> ARRAY[genre]`, which the GIN index on
+    genres answers; SQLite test databases store genres as JSON and look
+    through them with json_each.
+    """
+    if db.engine.dialect.name == 'postgresql':
+        return model.genres.op('@>')(cast(array([genre]), ARRAY(String)))
+    genres = func.json_each(model.genres).alias('genre')
+    value = literal_column('genre.value')
+    return exists(select(value).select_from(genres).where(value == genre))
+
+
+def venue_directory(now=None, genre=None):
+    """Returns the venues grouped by (city, state) for the /venues page,
+    only those listing genre when one is given.
+
+    Upcoming show counts are read off the venues' counters (counters.py),
+    so the page is a single query over Venue alone; only venues whose
+    counters went stale since the last roll are counted from Show. Each
+    venue also carries the start of its next show, when the count next
+    changes.
+    """
+    if now is None:
+        now = show_clock()
+    rows = (
+        db.session.query(Venue.city, Venue.state, Venue.id, Venue.name,
+                         upcoming_shows_count(Venue, now), next_show_start(Venue, now))
+        .order_by(Venue.city, Venue.state, Venue.name, Venue.id)
+    )
+    if genre:
+        rows = rows.filter(has_genre(Venue, genre))
+    return group_venues_by_area(rows)
+
+
+def with_show_counts(model, id, now=None):
+    """Returns (instance, upcoming count, past count, next show start) for
+    one venue or artist, or None if there is no such row.
+
+    The counts are read off its counters, like venue_directory() does, in
+    the query loading the row; stale counters are recounted inline and
+    left for `flask roll-shows` to write.
+    """
+    if now is None:
+        now = show_clock()
+    return (
+        db.session.query(model, upcoming_shows_count(model, now), past_shows_count(model, now),
+                         next_show_start(model, now))
+        .filter(model.id == id)
+        .one_or_none()
+    )
+
+
+def group_venues_by_area(rows):
+    """Groups (city, state, id, name, num_upcoming_shows, next_show_start) rows by area.
+
+    Rows must already be ordered by city and state; they are consumed
+    in one pass so the query result never has to be held twice.
+    """
+    data = []
+    for (city, state), venues in groupby(rows, key=lambda row: (row[0], row[1])):
+        data.append({
+            "city": city,
+            "state": state,
+            "venues": [{
+                "id": venue_id,
+                "name": name,
+                "num_upcoming_shows": count,
+                "next_show_start": next_show_start
+            } for _, _, venue_id, name, count, next_show_start in venues]
+        })
+    return data
+
+
+def show_feed(cursor=None, limit=SHOWS_PER_PAGE):
+    """Returns one page of the /shows feed, newest first, and the next cursor.
+
+    Venue and artist names are joined in, and pages are keyed on
+    (start_time, id) instead of an offset, so every page costs one
+    indexed query no matter how deep into the feed it is.
+    """
+    query = (
+        db.session.query(
+            Show.id, Show.start_time,
+            Venue.id, Venue.name,
+            Artist.id, Artist.name, Artist.image_link)
+        .join(Venue, Show.venue_id == Venue.id)
+        .join(Artist, Show.artist_id == Artist.id)
+        .filter(Show.start_time.isnot(None))
+        .order_by(Show.start_time.desc(), Show.id.desc())
+    )
+    if cursor is not None:
+        query = query.filter(tuple_(Show.start_time, Show.id) < decode_show_cursor(cursor))
+    rows = query.limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_show_cursor(rows[-1][1], rows[-1][0])
+
+    data = [{
+        "venue_id": venue_id,
+        "venue_name": venue_name,
+        "artist_id": artist_id,
+        "artist_name": artist_name,
+        "artist_image_link": artist_image_link,
+        "start_time": start_time
+    } for _, start_time, venue_id, venue_name, artist_id, artist_name, artist_image_link in rows]
+    return data, next_cursor
+
+
+def encode_show_cursor(start_time, show_id):
+    return '{}_{}'.format(start_time.isoformat(), show_id)
+
+
+def decode_show_cursor(cursor):
+    """Parses a cursor made by encode_show_cursor, raising ValueError if malformed."""
+    start_time, _, show_id = cursor.rpartition('_')
+    return datetime.fromisoformat(start_time), int(show_id)
+
+
+def venue_shows(venue_id, now=None):
+    """Returns (upcoming, past) shows of a venue with their artists' details."""
+    return _partitioned_shows(Show.venue_id == venue_id, Artist, Show.artist_id, 'artist', now)
+
+
+def artist_shows(artist_id, now=None):
+    """Returns (upcoming, past) shows of an artist with their venues' details."""
+    return _partitioned_shows(Show.artist_id == artist_id, Venue, Show.venue_id, 'venue', now)
+
+
+def _partitioned_shows(criterion, counterpart, counterpart_key, prefix, now):
+    # Shows come back ordered by start_time, so one bisect at `now`
+    # splits them into past and upcoming without a second query.
+    if now is None:
+        now = show_clock()
+    rows = (
+        db.session.query(Show.start_time, counterpart.id, counterpart.name, counterpart.image_link)
+        .join(counterpart, counterpart_key == counterpart.id)
+        .filter(criterion, Show.start_time.isnot(None))
+        .order_by(Show.start_time, Show.id)
+        .all()
+    )
+    split = bisect_right([row[0] for row in rows], now)
+    shows = [{
+        prefix + "_id": counterpart_id,
+        prefix + "_name": name,
+        prefix + "_image_link": image_link,
+        "start_time": start_time
+    } for start_time, counterpart_id, name, image_link in rows]
+    return shows[split:], shows[:split]
@@ -0,0 +1,237 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from flask import g, session
+
+RENDER_CACHE_BACKEND = 'memory'
+RENDER_CACHE_SIZE = 512
+RENDER_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'fyyur-render-cache')
+RENDER_CACHE_HEADERS = True
+
+#----------------------------------------------------------------------------#
+# Backends.
+#----------------------------------------------------------------------------#
+
+class MemoryBackend(object):
+    """Rendered pages in an LRU of maxsize entries, in this process only.
+
+    Versions live beside the LRU and are never evicted, so a page whose
+    entity changed can't come back under an old version. With several
+    worker processes each has its own cache and only sees its own bumps;
+    use the filesystem backend there.
+    """
+
+    def __init__(self, maxsize=RENDER_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.versions = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def set(self, key, body, expires_at):
+        with self.lock:
+            self.entries[key] = (body, expires_at)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def version(self, name):
+        return self.versions.get(name, 0)
+
+    def bump(self, name):
+        with self.lock:
+            self.versions[name] = self.versions.get(name, 0) + 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.versions.clear()
+
+
+class FilesystemBackend(object):
+    """Rendered pages as files under directory, shared by every process
+    on the host.
+
+    A version is the size of a file that bumps append one byte to, which
+    O_APPEND keeps atomic across processes. Pages are written to a
+    temporary file and renamed into place, so readers never see half a
+    page. Pages left behind by a bump are not removed; clear() or a
+    periodic sweep of the directory takes care of them.
+    """
+
+    def __init__(self, directory=RENDER_CACHE_DIR):
+        self.directory = directory
+        os.makedirs(os.path.join(directory, 'pages'), exist_ok=True)
+        os.makedirs(os.path.join(directory, 'versions'), exist_ok=True)
+
+    def _path(self, kind, key):
+        return os.path.join(self.directory, kind, hashlib.sha1(key.encode('utf-8')).hexdigest())
+
+    def get(self, key):
+        try:
+            with open(self._path('pages', key), 'rb') as f:
+                expires_at = f.readline().strip()
+                body = f.read().decode('utf-8')
+        except FileNotFoundError:
+            return None
+        return body, float(expires_at) if expires_at else None
+
+    def set(self, key, body, expires_at):
+        path = self._path('pages', key)
+        fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, 'wb') as f:
+            f.write(('{!r}'.format(expires_at) if expires_at is not None else '').encode('ascii') + b'\n')
+            f.write(body.encode('utf-8'))
+        os.replace(temporary, path)
+
+    def delete(self, key):
+        try:
+            os.remove(self._path('pages', key))
+        except FileNotFoundError:
+            pass
+
+    def version(self, name):
+        try:
+            return os.path.getsize(self._path('versions', name))
+        except FileNotFoundError:
+            return 0
+
+    def bump(self, name):
+        with open(self._path('versions', name), 'ab') as f:
+            f.write(b'.')
+
+    def clear(self):
+        for kind in ('pages', 'versions'):
+            directory = os.path.join(self.directory, kind)
+            for name in os.listdir(directory):
+                os.remove(os.path.join(directory, name))
+
+
+BACKENDS = {
+    'memory': lambda app: MemoryBackend(app.config.get('RENDER_CACHE_SIZE', RENDER_CACHE_SIZE)),
+    'filesystem': lambda app: FilesystemBackend(app.config.get('RENDER_CACHE_DIR', RENDER_CACHE_DIR)),
+}
+
+#----------------------------------------------------------------------------#
+# Render cache.
+#----------------------------------------------------------------------------#
+
+class RenderCache(object):
+    """Caches rendered pages under keys built from entity versions.
+
+    A key names the entities a page shows, each with its current version,
+    e.g. 'venue:3:v7|artists:v2', and write handlers bump the versions of
+    what they change, so a stale page is never looked up again. A page
+    whose content also depends on the clock, like which shows are still
+    upcoming, is stored with the time it stops being valid.
+
+    Requests with flashed messages waiting are rendered but not cached,
+    since the messages are part of the page. RENDER_CACHE_BACKEND picks
+    the backend, 'memory', 'filesystem' or None to turn caching off.
+    """
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.bypassed = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend = app.config.get('RENDER_CACHE_BACKEND', RENDER_CACHE_BACKEND)
+        self.backend = BACKENDS[backend](app) if backend else None
+        app.extensions['render_cache'] = self
+
+        @app.after_request
+        def report_render_cache(response):
+            status = g.pop('render_cache', None)
+            if status is not None and app.config.get('RENDER_CACHE_HEADERS', RENDER_CACHE_HEADERS):
+                response.headers['X-Render-Cache'] = status
+            return response
+
+    def key(self, *names):
+        """Returns the key of a page showing the named entities, e.g.
+        key('venue:3', 'artists') -> 'venue:3:v7|artists:v2'."""
+        return '|'.join('{}:v{}'.format(name, self.version(name)) for name in names)
+
+    def version(self, name):
+        return self.backend.version(name) if self.backend is not None else 0
+
+    def bump(self, *names):
+        """Invalidates every page whose key names one of these entities."""
+        if self.backend is None:
+            return
+        for name in names:
+            self.backend.bump(name)
+
+    def get_or_render(self, key, render):
+        """Returns the page cached under key, or calls render and caches
+        what it returns.
+
+        render returns the page, or (page, expires_at) when the page is
+        only valid until expires_at, a time.time() timestamp; None means
+        it doesn't expire.
+        """
+        if self.backend is None or '_flashes' in session:
+            g.render_cache = 'bypass'
+            self._count('bypassed')
+            return _page(render())[0]
+        entry = self.backend.get(key)
+        if entry is not None:
+            body, expires_at = entry
+            if expires_at is None or expires_at > time.time():
+                g.render_cache = 'hit'
+                self._count('hits')
+                return body
+            self.backend.delete(key)
+            self._count('expired')
+        g.render_cache = 'miss'
+        self._count('misses')
+        body, expires_at = _page(render())
+        self.backend.set(key, body, expires_at)
+        return body
+
+    def _count(self, counter):
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+        with self.lock:
+            self.hits = self.misses = self.expired = self.bypassed = 0
+
+    def stats(self):
+        """Hit and miss counts of this process; expired entries count as
+        misses too."""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'expired': self.expired,
+                'bypassed': self.bypassed,
+                'hit_ratio': self.hits / lookups if lookups else None,
+                'backend': type(self.backend).__name__ if self.backend is not None else None
+            }
+
+
+def _page(rendered):
+    return rendered if isinstance(rendered, tuple) else (rendered, None)
@@ -0,0 +1,173 @@
+import threading
+
+from sqlalchemy import event, func
+
+from models import db, Venue, Artist
+
+SEARCH_RESULTS_PER_PAGE = 20
+
+#----------------------------------------------------------------------------#
+# Venue and artist search.
+#
+# Terms match, case-insensitively, anywhere in a venue's or artist's name,
+# city, state or genres. Name matches rank first. Only the id and name the
+# search templates render are loaded, one page at a time.
+#----------------------------------------------------------------------------#
+
+def search_venues(term, page=1, per_page=SEARCH_RESULTS_PER_PAGE):
+    return _backend().search(Venue, term, page, per_page)
+
+
+def search_artists(term, page=1, per_page=SEARCH_RESULTS_PER_PAGE):
+    return _backend().search(Artist, term, page, per_page)
+
+
+def _backend():
+    if db.engine.dialect.name == 'postgresql':
+        return postgres_search
+    return ngram_search
+
+
+def _results(count, data, page, per_page):
+    return {
+        "count": count,
+        "data": data,
+        "page": page,
+        "per_page": per_page,
+        "has_next": page * per_page < count
+    }
+
+
+class PostgresSearch(object):
+    """Searches through the pg_trgm indexed documents of the search migration.
+
+    Results are ranked by full-text rank of the whole document plus the
+    trigram similarity of the name.
+    """
+
+    documents = {
+        Venue: lambda: func.fyyur_venue_document(Venue.name, Venue.city, Venue.state, Venue.genres),
+        Artist: lambda: func.fyyur_artist_document(Artist.name, Artist.city, Artist.state, Artist.genres),
+    }
+
+    def search(self, model, term, page, per_page):
+        count = self.matches(model, term).count()
+        if count == 0:
+            return _results(0, [], page, per_page)
+        rows = self.ranked(model, term, page, per_page).all()
+        return _results(count, [{"id": id, "name": name} for id, name in rows], page, per_page)
+
+    def matches(self, model, term):
+        """The ids of the rows whose document contains term."""
+        return db.session.query(model.id).filter(self._contains(model, term))
+
+    def ranked(self, model, term, page, per_page):
+        """One page of (id, name) rows containing term, best ranked first."""
+        document = self.documents[model]()
+        rank = (
+            func.ts_rank(func.to_tsvector('simple', document), func.plainto_tsquery('simple', term))
+            + func.similarity(model.name, term)
+        )
+        return (
+            db.session.query(model.id, model.name)
+            .filter(self._contains(model, term))
+            .order_by(rank.desc(), model.name, model.id)
+            .offset((page - 1) * per_page)
+            .limit(per_page)
+        )
+
+    def _contains(self, model, term):
+        pattern = '%{}%'.format(_escape_like(term))
+        return self.documents[model]().ilike(pattern, escape='\\')
+
+
+class NgramIndex(object):
+    """An in-memory trigram index over (id, name, document) rows.
+
+    Terms of three characters or more only look at rows sharing all of
+    the term's trigrams; shorter terms fall back to a scan.
+    """
+
+    def __init__(self, n=3):
+        self.n = n
+        self.rows = {}
+        self.postings = {}
+
+    def grams(self, text):
+        return set(text[i:i + self.n] for i in range(len(text) - self.n + 1))
+
+    def add(self, id, name, document):
+        document = document.lower()
+        self.rows[id] = (name, document)
+        for gram in self.grams(document):
+            self.postings.setdefault(gram, set()).add(id)
+
+    def search(self, term):
+        term = term.lower()
+        grams = self.grams(term)
+        if grams:
+            postings = sorted((self.postings.get(gram, set()) for gram in grams), key=len)
+            candidates = set.intersection(*postings)
+        else:
+            candidates = self.rows.keys()
+        matches = [id for id in candidates if term in self.rows[id][1]]
+        return sorted(matches, key=lambda id: self._rank(id, term))
+
+    def _rank(self, id, term):
+        name = (self.rows[id][0] or '').lower()
+        if name.startswith(term):
+            return (0, name, id)
+        if term in name:
+            return (1, name, id)
+        return (2, name, id)
+
+
+class NgramSearch(object):
+    """Fallback for databases without pg_trgm, such as SQLite test runs.
+
+    One index per model is built on first use and dropped whenever a row of
+    that model is written through the ORM.
+    """
+
+    def __init__(self):
+        self.indexes = {}
+        self.lock = threading.Lock()
+
+    def invalidate(self, model=None):
+        with self.lock:
+            if model is None:
+                self.indexes.clear()
+            else:
+                self.indexes.pop(model, None)
+
+    def index(self, model):
+        with self.lock:
+            index = self.indexes.get(model)
+            if index is None:
+                index = NgramIndex()
+                rows = db.session.query(model.id, model.name, model.city, model.state, model.genres)
+                for id, name, city, state, genres in rows:
+                    if isinstance(genres, (list, tuple)):
+                        genres = ' '.join(genres)
+                    index.add(id, name, ' '.join(field or '' for field in (name, city, state, genres)))
+                self.indexes[model] = index
+            return index
+
+    def search(self, model, term, page, per_page):
+        index = self.index(model)
+        matches = index.search(term)
+        start = (page - 1) * per_page
+        data = [{"id": id, "name": index.rows[id][0]} for id in matches[start:start + per_page]]
+        return _results(len(matches), data, page, per_page)
+
+
+def _escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+postgres_search = PostgresSearch()
+ngram_search = NgramSearch()
+
+for _model in (Venue, Artist):
+    for _event in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(_model, _event, lambda mapper, connection, target: ngram_search.invalidate(type(target)))
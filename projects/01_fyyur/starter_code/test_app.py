@@ -0,0 +1,384 @@
+import gzip
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+
+import babel.dates
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.schema import CreateIndex
+
+# The app reads config.py on import; the tests run against their own database,
+# an in-memory SQLite one unless FYYUR_TEST_DATABASE_URL says otherwise.
+import app as fyyur
+from models import db, Venue, Artist, Show
+from counters import roll_shows, show_clock
+from queries import venue_directory
+from dates import format_datetime, format_datetimes
+from fsnd_common.profiling import assert_max_queries, capture_queries
+from render_cache import FilesystemBackend
+from search import postgres_search
+
+
+class FyyurTestCase(unittest.TestCase):
+    """Page rendering and the query budget of every listing and detail page."""
+
+    @classmethod
+    def setUpClass(cls):
+        fyyur.app.config.update(
+            SQLALCHEMY_DATABASE_URI=os.environ.get('FYYUR_TEST_DATABASE_URL', 'sqlite://'),
+            TESTING=True,
+            WTF_CSRF_ENABLED=False,
+            PROFILE_SLOW_REQUEST_MS=500,
+        )
+
+    def setUp(self):
+        self.app = fyyur.app
+        self.client = self.app.test_client
+        fyyur.render_cache.clear()
+        with self.app.app_context():
+            db.drop_all()
+            db.create_all()
+            now = show_clock()
+            venues = [Venue(name='The Musical Hop {}'.format(i), city='San Francisco', state='CA',
+                            address='1015 Folsom Street', genres=['Jazz', 'Swing'])
+                      for i in range(3)]
+            artists = [Artist(name='Guns N Petals {}'.format(i), city='San Francisco', state='CA',
+                              genres=['Rock n Roll'])
+                       for i in range(3)]
+            db.session.add_all(venues + artists)
+            db.session.flush()
+            for i, venue in enumerate(venues):
+                for artist in artists:
+                    db.session.add(Show(venue_id=venue.id, artist_id=artist.id,
+                                        start_time=now + timedelta(days=i - 1, hours=artist.id)))
+            db.session.commit()
+            self.venue_id = venues[0].id
+            self.artist_id = artists[0].id
+            self.show_time = now + timedelta(days=-1, hours=artists[0].id)
+            self.next_show_time = min(show.start_time for show in Show.query.filter_by(venue_id=venues[1].id))
+            self.next_show_venue_id = venues[1].id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    '''
+        Query budgets
+    '''
+    def test_venues_query_budget(self):
+        with assert_max_queries(1):
+            res = self.client().get('/venues')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'The Musical Hop 2', res.data)
+
+    def test_artists_query_budget(self):
+        with assert_max_queries(1):
+            res = self.client().get('/artists')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'Guns N Petals 2', res.data)
+
+    def test_shows_query_budget(self):
+        with assert_max_queries(1):
+            res = self.client().get('/shows')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'Guns N Petals 0', res.data)
+
+    def test_show_venue_query_budget(self):
+        with assert_max_queries(2):
+            res = self.client().get('/venues/{}'.format(self.venue_id))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'The Musical Hop 0', res.data)
+
+    def test_show_artist_query_budget(self):
+        with assert_max_queries(2):
+            res = self.client().get('/artists/{}'.format(self.artist_id))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'Guns N Petals 0', res.data)
+
+    def test_404_show_venue(self):
+        res = self.client().get('/venues/100000')
+        self.assertEqual(res.status_code, 404)
+
+    '''
+        Search
+    '''
+    def test_search_venues(self):
+        res = self.client().post('/venues/search', data={'search_term': 'musical hop'})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'Number of search results for "musical hop": 3', res.data)
+
+    '''
+        Compression
+    '''
+    def test_listing_compressed(self):
+        res = self.client().get('/venues', headers={'Accept-Encoding': 'gzip'})
+
+        self.assertEqual(res.headers['Content-Encoding'], 'gzip')
+        self.assertIn(b'The Musical Hop 0', gzip.decompress(res.data))
+
+    def test_pages_echoing_input_not_compressed(self):
+        headers = {'Accept-Encoding': 'gzip'}
+        for res in [self.client().post('/venues/search', data={'search_term': 'hop'}, headers=headers),
+                    self.client().post('/artists/search', data={'search_term': 'guns'}, headers=headers),
+                    self.client().get('/venues?genre=Jazz', headers=headers),
+                    self.client().get('/artists?genre=Jazz', headers=headers)]:
+            self.assertEqual(res.status_code, 200)
+            self.assertNotIn('Content-Encoding', res.headers)
+            self.assertIn('no-transform', res.headers['Cache-Control'])
+
+    def test_postgres_search_filters_on_indexed_document(self):
+        index = next(index for index in Venue.__table__.indexes if index.name == 'ix_Venue_search_trgm')
+        document = str(index.expressions[0].element.compile(dialect=postgresql.dialect()))
+        with self.app.app_context():
+            statement = postgres_search.ranked(Venue, '50%_off', 2, 20).statement
+        compiled = statement.compile(dialect=postgresql.dialect())
+
+        # The planner only uses the index for the very same expression.
+        self.assertIn('USING gin (fyyur_venue_document(name, city, state, genres) gin_trgm_ops)',
+                      str(CreateIndex(index).compile(dialect=postgresql.dialect())))
+        self.assertIn(document + ' ILIKE', str(compiled))
+        self.assertIn('ts_rank(to_tsvector(', str(compiled))
+        self.assertIn('similarity("Venue".name', str(compiled))
+        self.assertIn('%50\\%\\_off%', compiled.params.values())
+        self.assertEqual((compiled.params['param_1'], compiled.params['param_2']), (20, 20))
+
+    @unittest.skipUnless(os.environ.get('FYYUR_TEST_DATABASE_URL', '').startswith('postgresql'),
+                         'needs a Postgres FYYUR_TEST_DATABASE_URL with pg_trgm')
+    def test_postgres_search(self):
+        res = self.client().post('/venues/search', data={'search_term': 'musical hop'})
+        self.assertIn(b'Number of search results for "musical hop": 3', res.data)
+
+        res = self.client().post('/artists/search', data={'search_term': 'rock n'})
+        self.assertIn(b'Number of search results for "rock n": 3', res.data)
+
+    '''
+        Genre browsing
+    '''
+    def test_browse_venues_and_artists_by_genre(self):
+        with self.app.app_context():
+            db.session.add(Venue(name='Park Square Live Music', city='San Francisco', state='CA', genres=['Folk']))
+            db.session.add(Artist(name='The Wild Sax Band', city='San Francisco', state='CA', genres=['Folk', 'Jazz']))
+            db.session.commit()
+
+        with assert_max_queries(1):
+            res = self.client().get('/venues?genre=Folk')
+        self.assertIn(b'Park Square Live Music', res.data)
+        self.assertNotIn(b'The Musical Hop 0', res.data)
+
+        res = self.client().get('/artists?genre=Rock+n+Roll')
+        self.assertIn(b'Guns N Petals 0', res.data)
+        self.assertNotIn(b'The Wild Sax Band', res.data)
+        res = self.client().get('/artists')
+        self.assertIn(b'The Wild Sax Band', res.data)
+
+    '''
+        Datetime formatting
+    '''
+    def test_format_datetime_matches_babel(self):
+        value = datetime(2019, 5, 21, 21, 30)
+        for format in ['full', 'long', 'medium', 'short', 'MM/dd/yyyy, HH:mm']:
+            for locale in ['en_US', 'de_DE', 'ja_JP']:
+                expected = babel.dates.format_datetime(value, format, locale=locale)
+                self.assertEqual(format_datetime(value, format, locale), expected)
+                self.assertEqual(format_datetimes([value, value + timedelta(days=1), value], format, locale),
+                                 [expected, babel.dates.format_datetime(value + timedelta(days=1), format, locale=locale),
+                                  expected])
+        self.assertEqual(format_datetime('2019-05-21T21:30:00', 'full'),
+                         babel.dates.format_datetime(value, 'full'))
+
+    def test_show_venue_formats_show_times(self):
+        res = self.client().get('/venues/{}'.format(self.venue_id))
+
+        self.assertIn(babel.dates.format_datetime(self.show_time, 'full').encode(), res.data)
+
+    '''
+        Render cache
+    '''
+    def test_cached_page_skips_queries(self):
+        self.client().get('/venues/{}'.format(self.venue_id))
+        with assert_max_queries(0):
+            res = self.client().get('/venues/{}'.format(self.venue_id))
+
+        self.assertEqual(res.headers['X-Render-Cache'], 'hit')
+        self.assertIn(b'The Musical Hop 0', res.data)
+        self.assertEqual(fyyur.render_cache.stats()['hit_ratio'], 0.5)
+
+    def test_write_invalidates_cached_page(self):
+        self.client().get('/venues')
+        self.client().post('/venues/create', data={
+            'name': 'Park Square Live Music', 'city': 'San Francisco', 'state': 'CA',
+            'address': '34 Whiskey Moore Ave', 'phone': '415-000-1234', 'genres': 'Jazz'})
+        # Drop the flashed message, or the page would bypass the cache.
+        with self.client() as client:
+            with client.session_transaction() as session:
+                session.pop('_flashes', None)
+            res = client.get('/venues')
+
+        self.assertEqual(res.headers['X-Render-Cache'], 'miss')
+        self.assertIn(b'Park Square Live Music', res.data)
+
+    def test_cached_page_expires_at_next_show(self):
+        self.client().get('/venues/{}'.format(self.next_show_venue_id))
+
+        key = fyyur.render_cache.key('venue:{}'.format(self.next_show_venue_id), 'artists')
+        _, expires_at = fyyur.render_cache.backend.get(key)
+        self.assertEqual(expires_at, self.next_show_time.replace(tzinfo=timezone.utc).timestamp())
+
+    def test_filesystem_backend(self):
+        with tempfile.TemporaryDirectory() as directory:
+            backend = FilesystemBackend(directory)
+            backend.set('venue:1:v0', '<html>', 1.5)
+            backend.bump('venue:1')
+            backend.bump('venue:1')
+
+            self.assertEqual(backend.get('venue:1:v0'), ('<html>', 1.5))
+            self.assertEqual(backend.version('venue:1'), 2)
+            backend.clear()
+            self.assertIsNone(backend.get('venue:1:v0'))
+            self.assertEqual(backend.version('venue:1'), 0)
+
+    '''
+        Show counters
+    '''
+    def test_show_writes_maintain_counters(self):
+        with self.app.app_context():
+            start_time = show_clock() + timedelta(hours=1)
+            show = Show(venue_id=self.venue_id, artist_id=self.artist_id, start_time=start_time)
+            db.session.add(show)
+            db.session.commit()
+            venue = Venue.query.get(self.venue_id)
+            self.assertEqual((venue.upcoming_shows_count, venue.past_shows_count), (1, 3))
+            self.assertEqual(venue.next_show_start, start_time)
+
+            db.session.delete(show)
+            db.session.commit()
+            venue = Venue.query.get(self.venue_id)
+            self.assertEqual((venue.upcoming_shows_count, venue.past_shows_count), (0, 3))
+
+    def test_roll_shows_recounts_stale_rows(self):
+        later = show_clock() + timedelta(days=2)
+        with self.app.app_context():
+            # Until rolled, the directory counts stale venues from Show.
+            counts = {venue['id']: venue['num_upcoming_shows']
+                      for area in venue_directory(later) for venue in area['venues']}
+            self.assertEqual(counts[self.next_show_venue_id], 0)
+
+            # Two venues and three artists have a show starting before then.
+            self.assertEqual(roll_shows(later), 5)
+            venue = Venue.query.get(self.next_show_venue_id)
+            self.assertEqual((venue.upcoming_shows_count, venue.past_shows_count), (0, 3))
+            self.assertIsNone(venue.next_show_start)
+            self.assertEqual(roll_shows(later), 0)
+
+    def set_counters(self, model, id, upcoming, past, next_show_start):
+        with self.app.app_context():
+            db.session.execute(model.__table__.update().where(model.id == id).values(
+                upcoming_shows_count=upcoming, past_shows_count=past, next_show_start=next_show_start))
+            db.session.commit()
+        fyyur.render_cache.clear()
+
+    def test_detail_pages_read_counters(self):
+        # Counters that are current are shown as they are, not recounted.
+        self.set_counters(Venue, self.next_show_venue_id, 5, 6, self.next_show_time)
+        self.set_counters(Artist, self.artist_id, 8, 9, self.next_show_time)
+
+        self.assertIn(b'5 Upcoming Shows', self.client().get('/venues/{}'.format(self.next_show_venue_id)).data)
+        res = self.client().get('/artists/{}'.format(self.artist_id))
+        self.assertIn(b'8 Upcoming Shows', res.data)
+        self.assertIn(b'9 Past Shows', res.data)
+
+    def test_detail_page_recounts_stale_counters_without_writing(self):
+        # Counters due a roll, and wrong besides.
+        self.set_counters(Venue, self.next_show_venue_id, 7, 7, show_clock() - timedelta(hours=1))
+
+        with capture_queries() as log:
+            res = self.client().get('/venues/{}'.format(self.next_show_venue_id))
+
+        self.assertIn(b'3 Upcoming Shows', res.data)
+        self.assertIn(b'0 Past Shows', res.data)
+        self.assertFalse([statement for statement, _ in log.statements if not statement.lstrip().startswith('SELECT')])
+        with self.app.app_context():
+            self.assertEqual(Venue.query.get(self.next_show_venue_id).upcoming_shows_count, 7)
+
+    '''
+        Profiler
+    '''
+    def test_assert_max_queries_fails_over_budget(self):
+        with self.assertRaises(AssertionError) as context:
+            with assert_max_queries(0):
+                self.client().get('/venues')
+        self.assertIn('1 queries executed, expected at most 0', str(context.exception))
+
+    def test_failed_query_is_logged(self):
+        with self.app.app_context():
+            with capture_queries() as log:
+                with self.assertRaises(DBAPIError):
+                    db.session.execute(text('SELECT * FROM missing_table'))
+                db.session.rollback()
+                db.session.execute(text('SELECT 1'))
+
+        self.assertEqual([statement for statement, _ in log.statements], ['SELECT * FROM missing_table', 'SELECT 1'])
+        self.assertTrue(all(seconds >= 0 for _, seconds in log.statements))
+
+    def test_query_count_headers(self):
+        with capture_queries() as log:
+            res = self.client().get('/venues/{}'.format(self.venue_id))
+
+        self.assertEqual(res.headers['X-Query-Count'], str(log.count))
+        self.assertIn('db;dur=', res.headers['Server-Timing'])
+        self.assertIn('app;dur=', res.headers['Server-Timing'])
+
+    def test_slow_request_logged(self):
+        self.app.config['PROFILE_SLOW_REQUEST_MS'] = 0
+        try:
+            with self.assertLogs(self.app.logger, 'WARNING') as logs:
+                self.client().get('/venues')
+        finally:
+            self.app.config['PROFILE_SLOW_REQUEST_MS'] = 500
+        self.assertIn('slow request GET /venues', logs.output[0])
+        self.assertIn('Venue', logs.output[0])
+
+
+class BenchmarkTestCase(unittest.TestCase):
+    """Runs every benchmark at a tiny scale, so they keep up with the schema.
+
+    Each runs in its own process, as the benchmarks rebind the app to their
+    database. All but datetime_formatting need FYYUR_BENCH_DATABASE_URL,
+    a Postgres database with pg_trgm available, which they wipe.
+    """
+
+    def run_benchmark(self, name, *args):
+        result = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.' + name] + list(args),
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
+        self.assertEqual(result.returncode, 0, result.stdout)
+
+    def test_datetime_formatting(self):
+        self.run_benchmark('datetime_formatting', '--shows', '50')
+
+    @unittest.skipUnless(os.environ.get('FYYUR_BENCH_DATABASE_URL'), 'needs FYYUR_BENCH_DATABASE_URL')
+    def test_database_benchmarks(self):
+        for name, args in [
+                ('compression', ['--venues', '20', '--repeat', '1']),
+                ('indexes', ['--venues', '20', '--artists', '5', '--shows-per-venue', '2']),
+                ('load', ['--venues', '20', '--shows-per-venue', '2', '--requests', '20', '--warmup', '2']),
+                ('venue_directory', ['--sizes', '10', '20'])]:
+            with self.subTest(benchmark=name):
+                self.run_benchmark(name, *args)
+
+
+if __name__ == '__main__':
+    unittest.main()
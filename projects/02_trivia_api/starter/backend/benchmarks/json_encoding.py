@@ -0,0 +1,69 @@
+'''
+Compares encoders on the heaviest trivia response, a search matching
+1,000 questions, as flask.jsonify and as each json provider builds it.
+
+    $ python -m benchmarks.json_encoding --questions 1000 --repeat 200
+'''
+import argparse
+import sys
+import time
+
+import flask
+from flask import Flask
+
+from fsnd_common import json_provider
+
+
+def search_response(questions):
+  return {
+    'success': True,
+    'questions': [{
+      'id': i + 1,
+      'question': 'Which of these {} questions is number {}, the one after {}?'.format(questions, i + 1, i),
+      'answer': 'Answer {}'.format(i + 1),
+      'category': i % 6 + 1,
+      'difficulty': i % 5 + 1
+    } for i in range(questions)],
+    'total_questions': questions,
+    'current_category': None
+  }
+
+
+def measure(encode, repeat):
+  size = len(encode())
+  start = time.perf_counter()
+  for _ in range(repeat):
+    encode()
+  return (time.perf_counter() - start) / repeat, size
+
+
+def run(questions, repeat):
+  payload = search_response(questions)
+  app = Flask(__name__)
+  providers = [json_provider.StdlibJSONProvider]
+  if json_provider.orjson is not None:
+    providers.append(json_provider.OrjsonJSONProvider)
+  else:
+    print('orjson is not installed, skipping it')
+
+  encoders = {'flask.jsonify': lambda: flask.jsonify(payload).get_data()}
+  for provider in providers:
+    encoders[provider.name] = (lambda provider: lambda: provider.dumps(payload))(provider(app))
+
+  print('{} questions, {} runs each'.format(questions, repeat))
+  with app.app_context():
+    baseline = None
+    for name, encode in encoders.items():
+      seconds, size = measure(encode, repeat)
+      baseline = baseline or seconds
+      print('{:<14} {:9.1f} us   {:7.1f} KB   {:5.2f}x'.format(
+        name, seconds * 1e6, size / 1024, baseline / seconds))
+  return 0
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--questions', type=int, default=1000)
+  parser.add_argument('--repeat', type=int, default=200)
+  args = parser.parse_args()
+  sys.exit(run(args.questions, args.repeat))
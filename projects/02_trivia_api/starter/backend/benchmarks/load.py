@@ -0,0 +1,55 @@
+'''
+Load test replaying a mix of the hot trivia endpoints.
+
+Seeds a deterministic question bank, then sends a weighted mix of
+category, paging, search and quiz requests and prints p50/p95/p99
+latency, throughput and peak RSS per endpoint as JSON.
+
+    $ python -m benchmarks.load --questions 100000 --requests 2000 --output load.json
+'''
+import argparse
+import sys
+
+from benchmarks import WORDS, category_names, create_bench_app, question_records, seed
+from fsnd_common.loadtest import Endpoint, Request, add_arguments, post_json, run_mix, write_results
+
+
+def endpoints(questions, categories, per_page=10):
+  pages = max(questions // per_page, 1)
+  return [
+    Endpoint('GET /categories', 3, lambda rng: Request('GET', '/categories')),
+    Endpoint('GET /questions?page', 4,
+             lambda rng: Request('GET', '/questions?page={}'.format(rng.randint(1, pages)))),
+    Endpoint('GET /questions?after', 2,
+             lambda rng: Request('GET', '/questions?after={}'.format(rng.randint(0, max(questions - per_page, 0))))),
+    Endpoint('GET /categories/<id>/questions', 1,
+             lambda rng: Request('GET', '/categories/{}/questions?stream=json'.format(rng.randint(1, categories)))),
+    Endpoint('POST /questions/search', 2,
+             lambda rng: post_json('/questions/search', {'searchTerm': rng.choice(WORDS)})),
+    Endpoint('POST /quizzes', 3,
+             lambda rng: post_json('/quizzes', {
+               'previous_questions': [rng.randint(1, questions) for _ in range(rng.randint(0, 5))],
+               'quiz_category': {'id': rng.randint(0, categories)}
+             })),
+  ]
+
+
+def run(args):
+  app = create_bench_app()
+  if not args.skip_seed:
+    seed(app, question_records(args.questions, args.categories, args.seed), category_names(args.categories))
+  scale = {'questions': args.questions, 'categories': args.categories}
+  results = run_mix(app, endpoints(args.questions, args.categories), args.requests, seed=args.seed,
+                    warmup=args.warmup, server=args.server, scale=scale, name='trivia')
+  write_results(results, args.output)
+  return 1 if results['total']['errors'] else 0
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--questions', type=int, default=1000)
+  parser.add_argument('--categories', type=int, default=6)
+  parser.add_argument('--skip-seed', action='store_true',
+                      help='reuse the question bank a previous run seeded with the same sizes')
+  add_arguments(parser)
+  sys.exit(run(parser.parse_args()))
@@ -0,0 +1,58 @@
+'''
+Times a bulk question import the way `flask import-questions` runs it: a
+JSON Lines file of generated questions is loaded into an empty question
+bank, then loaded again, when every question is a duplicate.
+
+    $ python -m benchmarks.question_import --questions 100000 --batch-size 1000
+'''
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+from benchmarks import create_bench_app, question_records, seed
+from flaskr.ingest import IMPORT_BATCH_SIZE, QuestionImporter, read_records
+from models import db
+
+
+def write_questions(path, n):
+  with open(path, 'w', encoding='utf-8') as file:
+    for record in question_records(n):
+      file.write(json.dumps(record) + '\n')
+
+
+def load(app, path, batch_size):
+  with app.app_context():
+    importer = QuestionImporter(range(1, 7), batch_size)
+    with open(path, encoding='utf-8', newline='') as lines:
+      for _ in importer.run(read_records(lines, 'jsonl')):
+        pass
+    db.session.remove()
+    return importer.totals()
+
+
+def run(questions, batch_size):
+  app = create_bench_app()
+  seed(app, [])
+
+  with tempfile.TemporaryDirectory() as directory:
+    path = os.path.join(directory, 'questions.jsonl')
+    write_questions(path, questions)
+
+    print('{:<8} {:>10} {:>10} {:>10} {:>10}'.format('run', 'inserted', 'duplicates', 'seconds', 'rows/s'))
+    for name in ('first', 'second'):
+      totals = load(app, path, batch_size)
+      print('{:<8} {inserted:>10} {duplicates:>10} {seconds:>10.3f} {rows_per_second:>10}'.format(name, **totals))
+      if totals['rejected']:
+        print('{rejected} rejected'.format(**totals), file=sys.stderr)
+        return 1
+  return 0
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--questions', type=int, default=100000)
+  parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+  args = parser.parse_args()
+  sys.exit(run(args.questions, args.batch_size))
@@ -0,0 +1,80 @@
+'''
+Measures peak memory of a search answered as one jsonify() body and as a
+streamed response, for growing numbers of matching questions.
+Every measurement runs in a fresh process: peak is the tracemalloc peak of
+the Python heap while the response is produced and read, rss the growth of
+the process' peak resident set size.
+
+    $ python -m benchmarks.streaming_memory --sizes 1000 10000 100000
+'''
+import argparse
+import multiprocessing
+import resource
+import sys
+import tracemalloc
+
+from benchmarks import create_bench_app, seed
+
+MODES = {
+  'jsonify': '/questions/search',
+  'json': '/questions/search?stream=json',
+  'ndjson': '/questions/search?stream=ndjson'
+}
+
+
+def tag(size):
+  return '[{}]'.format(size)
+
+
+def records(sizes):
+  for i in range(max(sizes)):
+    tags = ' '.join(tag(size) for size in sizes if i < size)
+    yield {
+      'question': 'Benchmark question {} {}'.format(i, tags),
+      'answer': 'Answer {}'.format(i),
+      'category': i % 6 + 1,
+      'difficulty': i % 5 + 1
+    }
+
+
+def measure(mode, size, results):
+  app = create_bench_app()
+  client = app.test_client()
+  # Warm up imports, the connection pool and the category cache first.
+  client.post(MODES[mode], json={'searchTerm': tag(size) + ' no match'}).close()
+
+  rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  tracemalloc.start()
+  response = client.post(MODES[mode], json={'searchTerm': tag(size)}, buffered=False)
+  received = sum(len(chunk) for chunk in response.response)
+  response.close()
+  peak = tracemalloc.get_traced_memory()[1]
+  tracemalloc.stop()
+  rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+  results.put((peak, rss * 1024, received))
+
+
+def run(sizes, modes):
+  sizes = sorted(sizes)
+  app = create_bench_app()
+  seed(app, records(sizes))
+
+  print('{:<8} {:>8} {:>12} {:>12} {:>12}'.format('mode', 'matches', 'body', 'peak', 'rss'))
+  for size in sizes:
+    for mode in modes:
+      results = multiprocessing.Queue()
+      process = multiprocessing.Process(target=measure, args=(mode, size, results))
+      process.start()
+      peak, rss, received = results.get()
+      process.join()
+      print('{:<8} {:>8} {:>10.1f}MB {:>10.1f}MB {:>10.1f}MB'.format(
+        mode, size, received / 2**20, peak / 2**20, rss / 2**20))
+  return 0
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 10000, 100000])
+  parser.add_argument('--modes', nargs='+', default=list(MODES), choices=list(MODES))
+  args = parser.parse_args()
+  sys.exit(run(args.sizes, args.modes))
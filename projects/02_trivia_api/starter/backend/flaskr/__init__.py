@@ -1,12 +1,33 @@
 import os
-from flask import Flask, request, abort, jsonify
+import codecs
+import click
+from flask import Flask, request, abort
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
-import random
-
-from models import setup_db, Question, Category
+from sqlalchemy.dialects.postgresql import insert
+
+from models import setup_db, database_path, db, Question, question_digest
+from fsnd_common.json_provider import install_json_provider, jsonify
+from fsnd_common.compression import install_compression
+from fsnd_common.profiling import install_profiler
+from .cache import CachedValue
+from .quiz import QuizPool
+from .categories import CategoryCache
+from .streaming import stream_format, stream_questions
+from .ingest import IMPORT_BATCH_SIZE, IMPORT_FORMATS, QuestionImporter, read_records, hash_questions
 
 QUESTIONS_PER_PAGE = 10
+MAX_QUESTIONS_PER_PAGE = 100
+QUESTION_COUNT_TTL = 60
+QUIZ_POOL_TTL = 300
+CATEGORY_CACHE_TTL = 3600
+MAX_IMPORT_BATCH_SIZE = 10000
+
+IMPORT_MIMETYPES = {
+  'application/x-ndjson': 'jsonl',
+  'application/jsonl': 'jsonl',
+  'text/csv': 'csv'
+}
 
 '''
 @TODO: Set up CORS. Allow '*' for origins. Delete the sample route after completing the TODOs - COMPLETED
@@ -18,7 +39,19 @@ QUESTIONS_PER_PAGE = 10
 def create_app(test_config=None):
   # create and configure the app
   app = Flask(__name__)
-  setup_db(app)
+  app.config.from_mapping(
+    QUESTIONS_PER_PAGE=QUESTIONS_PER_PAGE,
+    MAX_QUESTIONS_PER_PAGE=MAX_QUESTIONS_PER_PAGE,
+    QUESTION_COUNT_TTL=QUESTION_COUNT_TTL,
+    QUIZ_POOL_TTL=QUIZ_POOL_TTL,
+    CATEGORY_CACHE_TTL=CATEGORY_CACHE_TTL
+  )
+  if test_config is not None:
+    app.config.from_mapping(test_config)
+  setup_db(app, app.config.get('DATABASE_PATH', database_path))
+  install_json_provider(app)
+  install_compression(app)
+  install_profiler(app)
   # CORS(app, resources={r"*/api/*": {"origins": "*"}})
   CORS(app, resources={r"/api/*": {"origins": "*"}})
 
@@ -28,16 +61,39 @@ def create_app(test_config=None):
     response.headers.add('Access-Control-Allow-Methods', 'GET,PATCH,POST,DELETE,OPTIONS')
     return response
 
-  QUESTIONS_PER_PAGE = 10
-
-  # Paginates the items recieved in the parameter items
+  # Total number of questions, cached since counting scans the whole table.
+  # Writes through this app invalidate it straight away.
+  question_count = CachedValue(lambda: Question.query.count(), app.config['QUESTION_COUNT_TTL'])
+  # Question ids per category, used to draw quiz questions.
+  quiz_pool = QuizPool(app.config['QUIZ_POOL_TTL'])
+  # Category map and the encoded /categories body, kept in memory.
+  category_cache = CategoryCache(app.config['CATEGORY_CACHE_TTL'])
+
+  # Paginates the query recieved in the parameter selection in SQL.
+  # ?page=<n> pages by offset; ?after=<id> pages by id (keyset), which
+  # stays fast however deep the page is. ?per_page=<n> sets the page size.
+  # A cursor that is not an id is a bad request, not the first page.
   def paginate_questions(request, selection):
-    page = request.args.get('page', 1, type=int)
-    start = (page-1) * QUESTIONS_PER_PAGE
-    end = start + QUESTIONS_PER_PAGE 
-    question = formatted_questions = [question.format() for question in selection]
-    current_question = question[start:end]
-    return current_question
+    per_page = request.args.get('per_page', app.config['QUESTIONS_PER_PAGE'], type=int)
+    per_page = min(max(per_page, 1), app.config['MAX_QUESTIONS_PER_PAGE'])
+    after = request.args.get('after')
+    if after is not None:
+      try:
+        after = int(after)
+      except ValueError:
+        abort(400)
+
+    selection = selection.order_by(Question.id)
+    if after is not None:
+      selection = selection.filter(Question.id > after)
+    else:
+      page = max(request.args.get('page', 1, type=int), 1)
+      selection = selection.offset((page-1) * per_page)
+    questions = selection.limit(per_page).all()
+
+    current_questions = [question.format() for question in questions]
+    next_cursor = questions[-1].id if len(questions) == per_page else None
+    return current_questions, next_cursor
 
 # -------------------------------------------------------------
 # Categories
@@ -49,15 +105,15 @@ def create_app(test_config=None):
   '''
 
   #  Retrieves all categories
+  #  The body is served pre-encoded from the category cache, and a request
+  #  whose If-None-Match carries the current ETag gets an empty 304.
   @app.route('/categories')
   def get_categories():
-    categories = Category.query.all()
-    formatted_categories = {category.id: category.type for category in categories}
-
-    return jsonify({
-      'success': True,
-      'categories': formatted_categories
-    })
+    body, etag = category_cache.body_and_etag()
+    response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
 
 # ------------------------------------------------------------
 #  Questions 
@@ -77,9 +133,8 @@ def create_app(test_config=None):
   # Retrievees list of paginated questions
   @app.route('/questions', methods=['GET'])
   def get_paginated_questions():
-    questions = Question.query.all()
-    current_questions = paginate_questions(request, questions)
-    categories = {category.id: category.type for category in Category.query.all()}
+    current_questions, next_cursor = paginate_questions(request, Question.query)
+    categories = category_cache.categories()
 
     if len(current_questions) == 0:
       abort(404)
@@ -87,9 +142,10 @@ def create_app(test_config=None):
     return jsonify({
       'success': True,
       'questions': current_questions,
-      'total_questions': len(questions),
+      'total_questions': question_count.get(),
       'categories': categories,
-      'current_category': None
+      'current_category': None,
+      'next_cursor': next_cursor
     })
 
   '''
@@ -105,6 +161,8 @@ def create_app(test_config=None):
     question = Question.query.filter(Question.id == question_id).first_or_404()
     try:
       question.delete()
+      question_count.invalidate()
+      quiz_pool.invalidate()
     except:
       abort(500)
     finally:
@@ -123,6 +181,8 @@ def create_app(test_config=None):
   of the questions list in the "List" tab.  
   '''
   # POSTs a new question to the database
+  # A question already in the bank (ignoring case and spacing) hits the
+  # unique question_hash index and is rejected with 422.
   @app.route('/questions', methods=['POST'])
   def add_question():
     request_data = request.get_json()
@@ -131,27 +191,90 @@ def create_app(test_config=None):
     difficulty = request_data['difficulty']
     category = request_data['category']
 
-    repeated_question = Question.query.filter(Question.question == question).one_or_none()
-
-    if repeated_question is None:
-      try:
-        new_question = Question(
+    try:
+      inserted = db.session.execute(
+        insert(Question.__table__)
+        .values(
           question=question,
           answer=answer,
           difficulty=difficulty,
-          category=category
+          category=category,
+          question_hash=question_digest(question)
         )
-        new_question.insert()
-      except:
-        abort(500)
-      finally:
-        return jsonify({
-          'success': True
-        })
-    else:
+        .on_conflict_do_nothing(index_elements=['question_hash'])
+      ).rowcount
+      db.session.commit()
+    except:
+      db.session.rollback()
+      abort(500)
+
+    if inserted == 0:
       abort(422)
+    question_count.invalidate()
+    quiz_pool.invalidate()
+    return jsonify({
+      'success': True
+    })
   
  
+  # Bulk loads questions streamed as JSON Lines or CSV (with a header row of
+  # question,answer,category,difficulty). The format comes from ?format= or
+  # the Content-Type. Questions already in the bank are skipped, and the
+  # response reports every batch with its throughput.
+  @app.route('/questions/import', methods=['POST'])
+  def import_questions():
+    format = request.args.get('format') or IMPORT_MIMETYPES.get(request.mimetype)
+    if format not in IMPORT_FORMATS:
+      abort(400)
+    batch_size = request.args.get('batch_size', IMPORT_BATCH_SIZE, type=int)
+    batch_size = min(max(batch_size, 1), MAX_IMPORT_BATCH_SIZE)
+
+    importer = QuestionImporter(category_cache.categories(), batch_size)
+    try:
+      for _ in importer.run(read_records(codecs.iterdecode(request.stream, 'utf-8'), format)):
+        pass
+    except UnicodeDecodeError:
+      abort(400)
+    finally:
+      question_count.invalidate()
+      quiz_pool.invalidate()
+
+    return jsonify({
+      'success': True,
+      'batches': importer.reports,
+      **importer.totals()
+    })
+
+  # flask import-questions questions.jsonl
+  # Loads a file the same way as POST /questions/import, printing each batch.
+  @app.cli.command('import-questions')
+  @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+  @click.option('--format', type=click.Choice(IMPORT_FORMATS), help='defaults to the file extension')
+  @click.option('--batch-size', default=IMPORT_BATCH_SIZE, show_default=True)
+  def import_questions_command(path, format, batch_size):
+    if format is None:
+      format = 'csv' if path.lower().endswith('.csv') else 'jsonl'
+    importer = QuestionImporter(category_cache.categories(), batch_size)
+    with open(path, encoding='utf-8', newline='') as lines:
+      for report in importer.run(read_records(lines, format)):
+        click.echo('batch {batch}: {inserted} inserted, {duplicates} duplicates, '
+                   '{rejected} rejected in {seconds:.3f}s ({rows_per_second} rows/s)'.format(**report))
+    totals = importer.totals()
+    click.echo('{inserted} inserted, {duplicates} duplicates, {rejected} rejected '
+               'in {seconds:.3f}s ({rows_per_second} rows/s)'.format(**totals))
+    for error in totals['errors']:
+      click.echo('line {line}: {error}'.format(**error), err=True)
+
+  # flask hash-questions
+  # Adds the question_hash column and index to a database restored from an
+  # older trivia.psql.
+  @app.cli.command('hash-questions')
+  def hash_questions_command():
+    repeated = hash_questions()
+    click.echo('question hashes are up to date')
+    if repeated:
+      click.echo('repeated questions left without a hash: ' + ', '.join(map(str, repeated)), err=True)
+
   '''
   @TODO: COMPLETED
   Create a POST endpoint to get questions based on a search term. 
@@ -163,11 +286,17 @@ def create_app(test_config=None):
   Try using the word "title" to start. 
   '''
   # Endpoint ot Search question based on the search term provided through the POST method
+  # ?stream=json or ?stream=ndjson streams the matches instead (see streaming.py)
   @app.route('/questions/search', methods=['POST'])
   def search_questions():
     search_term = request.get_json()['searchTerm']
     formatted_search_term = f'%{search_term}%'
 
+    format = stream_format(request)
+    if format is not None:
+      questions = Question.query.filter(Question.question.ilike(formatted_search_term)).order_by(Question.id)
+      return stream_questions(questions, format, current_category=None)
+
     try:
       questions = Question.query.filter(Question.question.ilike(formatted_search_term)).all()
       formatted_questions = [question.format() for question in questions]
@@ -192,15 +321,20 @@ def create_app(test_config=None):
   category to be shown. 
   '''
   #  Endpoint that retrieves a question within a particular category
+  #  ?stream=json or ?stream=ndjson streams the questions instead (see streaming.py)
   @app.route('/categories/<int:category_id>/questions')
   def get_categorized_questions(category_id):
-    category = Category.query.get(category_id)
+    category_type = category_cache.get(category_id)
     
-    if category is None:
+    if category_type is None:
       abort(404)
+    format = stream_format(request)
+    if format is not None:
+      questions = Question.query.filter(Question.category == category_id).order_by(Question.id)
+      return stream_questions(questions, format, current_category={category_id: category_type})
     else:
       try:
-        questions = Question.query.filter(Question.category == category.id)
+        questions = Question.query.filter(Question.category == category_id)
         formatted_questions = [question.format() for question in questions]
 
         total_questions = len(formatted_questions)
@@ -211,7 +345,7 @@ def create_app(test_config=None):
           'success': True,
           'questions': formatted_questions,
           'total_questions': total_questions,
-          'current_category': {category.id: category.type}
+          'current_category': {category_id: category_type}
         })
 
   '''
@@ -233,19 +367,25 @@ def create_app(test_config=None):
     quiz_category = request.get_json()['quiz_category']
 
     try:
-
-      if quiz_category['id'] != 0:
-        new_questions = Question.query.filter(Question.category == quiz_category['id']).filter(~Question.id.in_(previous_questions))
-      else:
-        new_questions = Question.query.filter(~Question.id.in_(previous_questions))
-      
-      formatted_questions = [question.format() for question in new_questions]
-
-      if (len(formatted_questions) > 0):
-        random_question = random.choice(formatted_questions)
+      category = quiz_category['id'] if quiz_category['id'] != 0 else None
+
+      # Draws an id from the in-memory pool and loads just that question.
+      # A question deleted by another process makes the pool stale, so it
+      # is reloaded once before giving up.
+      question = None
+      for _ in range(2):
+        question_id = quiz_pool.pick(category, previous_questions)
+        if question_id is None:
+          break
+        question = Question.query.get(question_id)
+        if question is not None:
+          break
+        quiz_pool.invalidate()
+
+      if question is not None:
         return jsonify({
           'success': True,
-          'question': random_question
+          'question': question.format()
         })
       else:
         return jsonify({
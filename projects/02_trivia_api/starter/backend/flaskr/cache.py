@@ -0,0 +1,28 @@
+import threading
+import time
+
+'''
+CachedValue
+    holds the result of calling `loader` for `ttl` seconds
+    invalidate() forces the next get() to call `loader` again
+'''
+class CachedValue:
+  def __init__(self, loader, ttl):
+    self.loader = loader
+    self.ttl = ttl
+    self.lock = threading.Lock()
+    self.value = None
+    self.expires_at = None
+
+  def get(self):
+    with self.lock:
+      now = time.monotonic()
+      if self.expires_at is None or now >= self.expires_at:
+        self.value = self.loader()
+        self.expires_at = now + self.ttl
+      return self.value
+
+  def invalidate(self):
+    with self.lock:
+      self.value = None
+      self.expires_at = None
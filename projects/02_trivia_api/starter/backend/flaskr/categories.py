@@ -0,0 +1,62 @@
+import hashlib
+
+from sqlalchemy import event
+
+from models import Category
+from .cache import CachedValue
+from fsnd_common.json_provider import dumps
+
+# Bumped by every Category write through the ORM; caches built under an
+# older generation are reloaded on their next read.
+generation = 0
+
+
+def _bump_generation(mapper, connection, target):
+  global generation
+  generation += 1
+
+
+for _event in ('after_insert', 'after_update', 'after_delete'):
+  event.listen(Category, _event, _bump_generation)
+
+'''
+CategoryCache
+    serves the {id: type} category map from memory
+
+    the /categories response body and its ETag are encoded once per load,
+    so a cached request neither queries the database nor encodes JSON.
+    entries are reloaded after `ttl` seconds, after any Category write
+    through the ORM, or after invalidate()
+'''
+class CategoryCache:
+  def __init__(self, ttl):
+    self.cached = CachedValue(self.load, ttl)
+
+  def load(self):
+    categories = {category.id: category.type for category in Category.query.order_by(Category.id)}
+    body = dumps({
+      'success': True,
+      'categories': categories
+    })
+    etag = hashlib.sha1(body).hexdigest()
+    return generation, categories, body, etag
+
+  def _entry(self):
+    entry = self.cached.get()
+    if entry[0] != generation:
+      self.cached.invalidate()
+      entry = self.cached.get()
+    return entry
+
+  def invalidate(self):
+    self.cached.invalidate()
+
+  def categories(self):
+    return self._entry()[1]
+
+  def get(self, category_id):
+    return self.categories().get(category_id)
+
+  def body_and_etag(self):
+    _, _, body, etag = self._entry()
+    return body, etag
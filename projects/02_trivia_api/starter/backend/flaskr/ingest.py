@@ -0,0 +1,177 @@
+import csv
+import io
+import json
+import time
+
+from sqlalchemy import text
+
+from models import db, question_digest
+
+IMPORT_BATCH_SIZE = 1000
+IMPORT_FORMATS = ('jsonl', 'csv')
+MAX_REPORTED_ERRORS = 20
+
+'''
+read_records(lines, format)
+    yields (line number, record) for every question in an iterable of text
+    lines, either JSON Lines (one object per line) or CSV with a header row;
+    a line that can't be decoded yields (line number, None)
+'''
+def read_records(lines, format):
+  if format == 'jsonl':
+    for number, line in enumerate(lines, 1):
+      if not line.strip():
+        continue
+      try:
+        record = json.loads(line)
+      except ValueError:
+        record = None
+      yield number, record if isinstance(record, dict) else None
+  elif format == 'csv':
+    reader = csv.DictReader(lines)
+    for record in reader:
+      yield reader.line_num, record
+  else:
+    raise ValueError(f'unsupported import format {format!r}')
+
+def _validate(record, categories):
+  if record is None:
+    raise ValueError('malformed record')
+  question = record.get('question')
+  answer = record.get('answer')
+  if not isinstance(question, str) or not question.strip():
+    raise ValueError('missing question')
+  if not isinstance(answer, str) or not answer.strip():
+    raise ValueError('missing answer')
+  try:
+    category = int(record.get('category'))
+    difficulty = int(record.get('difficulty'))
+  except (TypeError, ValueError):
+    raise ValueError('category and difficulty must be integers')
+  if category not in categories:
+    raise ValueError(f'unknown category {category}')
+  return {
+    'question': question.strip(),
+    'answer': answer.strip(),
+    'category': str(category),
+    'difficulty': difficulty,
+    'question_hash': question_digest(question)
+  }
+
+'''
+QuestionImporter
+Loads questions in batches, skipping any already in the bank
+
+    run(records) inserts the records from read_records() batch_size at a time,
+    one COPY, one INSERT and one commit per batch, and yields a report per
+    batch (inserted, duplicates, rejected, seconds, rows_per_second)
+    a batch is copied into a temporary table and moved into questions with
+    ON CONFLICT DO NOTHING, so the unique question_hash index drops both
+    questions already stored and repeats within the import
+    totals() sums the reports, with the first few rejected lines and why
+'''
+class QuestionImporter:
+  def __init__(self, categories, batch_size=IMPORT_BATCH_SIZE):
+    self.categories = set(int(category) for category in categories)
+    self.batch_size = batch_size
+    self.reports = []
+    self.errors = []
+
+  def run(self, records):
+    started = time.perf_counter()
+    rows, rejected = [], 0
+    for number, record in records:
+      try:
+        rows.append(_validate(record, self.categories))
+      except ValueError as error:
+        rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+          self.errors.append({'line': number, 'error': str(error)})
+      if len(rows) + rejected >= self.batch_size:
+        yield self._flush(rows, rejected, started)
+        started = time.perf_counter()
+        rows, rejected = [], 0
+    if rows or rejected:
+      yield self._flush(rows, rejected, started)
+
+  def _flush(self, rows, rejected, started):
+    inserted = 0
+    if rows:
+      inserted = _insert_rows(rows)
+      db.session.commit()
+    seconds = time.perf_counter() - started
+    report = {
+      'batch': len(self.reports) + 1,
+      'inserted': inserted,
+      'duplicates': len(rows) - inserted,
+      'rejected': rejected,
+      'seconds': round(seconds, 4),
+      'rows_per_second': round(len(rows) / seconds) if seconds else None
+    }
+    self.reports.append(report)
+    return report
+
+  def totals(self):
+    seconds = sum(report['seconds'] for report in self.reports)
+    inserted = sum(report['inserted'] for report in self.reports)
+    duplicates = sum(report['duplicates'] for report in self.reports)
+    return {
+      'inserted': inserted,
+      'duplicates': duplicates,
+      'rejected': sum(report['rejected'] for report in self.reports),
+      'seconds': round(seconds, 4),
+      'rows_per_second': round((inserted + duplicates) / seconds) if seconds else None,
+      'errors': self.errors
+    }
+
+# Returns how many of the rows were new.
+def _insert_rows(rows):
+  connection = db.session.connection()
+  connection.execute(text(
+    'CREATE TEMPORARY TABLE IF NOT EXISTS questions_import '
+    '(question text, answer text, difficulty integer, category integer, question_hash varchar(40)) '
+    'ON COMMIT DELETE ROWS'))
+  buffer = io.StringIO()
+  writer = csv.writer(buffer)
+  for row in rows:
+    writer.writerow((row['question'], row['answer'], row['difficulty'], row['category'], row['question_hash']))
+  buffer.seek(0)
+  cursor = connection.connection.cursor()
+  try:
+    cursor.copy_expert(
+      'COPY questions_import (question, answer, difficulty, category, question_hash) FROM STDIN WITH (FORMAT csv)',
+      buffer)
+  finally:
+    cursor.close()
+  return connection.execute(text(
+    'INSERT INTO questions (question, answer, difficulty, category, question_hash) '
+    'SELECT question, answer, difficulty, category, question_hash FROM questions_import '
+    'ON CONFLICT (question_hash) DO NOTHING')).rowcount
+
+'''
+hash_questions()
+    brings a database restored from an older trivia.psql up to date: adds
+    the question_hash column, fills it in and adds its unique index
+    returns the ids of questions left without a hash because they repeat
+    an earlier question; those have to be removed or reworded by hand
+'''
+def hash_questions():
+  connection = db.session.connection()
+  connection.execute(text('ALTER TABLE questions ADD COLUMN IF NOT EXISTS question_hash varchar(40)'))
+  seen = set(digest for digest, in connection.execute(text(
+    'SELECT question_hash FROM questions WHERE question_hash IS NOT NULL')))
+  updates, repeated = [], []
+  for id, question in connection.execute(text(
+      'SELECT id, question FROM questions WHERE question_hash IS NULL AND question IS NOT NULL ORDER BY id')):
+    digest = question_digest(question)
+    if digest in seen:
+      repeated.append(id)
+    else:
+      seen.add(digest)
+      updates.append({'id': id, 'question_hash': digest})
+  if updates:
+    connection.execute(text('UPDATE questions SET question_hash = :question_hash WHERE id = :id'), updates)
+  connection.execute(text(
+    'CREATE UNIQUE INDEX IF NOT EXISTS questions_question_hash_key ON questions (question_hash)'))
+  db.session.commit()
+  return repeated
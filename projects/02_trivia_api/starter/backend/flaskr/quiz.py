@@ -0,0 +1,50 @@
+import random
+from array import array
+
+from models import db, Question
+from .cache import CachedValue
+
+# Random draws that may hit an already played question before picking
+# from the remaining ids directly.
+MAX_DRAWS = 8
+
+'''
+QuizPool
+    keeps the question ids of every category in memory, so a quiz
+    question is drawn without loading or counting the candidate rows
+
+    pick(category, previous_questions)
+        returns a random question id of the category (None for all
+        categories) that is not in previous_questions, or None when
+        every question has been played
+'''
+class QuizPool:
+  def __init__(self, ttl):
+    self.pools = CachedValue(self.load, ttl)
+
+  def load(self):
+    pools = {None: array('l')}
+    rows = db.session.query(Question.id, Question.category).yield_per(10000)
+    for question_id, category in rows:
+      pools[None].append(question_id)
+      pools.setdefault(str(category), array('l')).append(question_id)
+    return pools
+
+  def invalidate(self):
+    self.pools.invalidate()
+
+  def pick(self, category, previous_questions):
+    ids = self.pools.get().get(None if category is None else str(category), ())
+    played = set(previous_questions)
+    if len(played) >= len(ids) and played.issuperset(ids):
+      return None
+
+    # With few questions played a random draw almost always hits an
+    # unplayed one, so this stays O(1) for any category size.
+    for _ in range(MAX_DRAWS):
+      question_id = ids[random.randrange(len(ids))]
+      if question_id not in played:
+        return question_id
+
+    remaining = [question_id for question_id in ids if question_id not in played]
+    return random.choice(remaining) if remaining else None
@@ -0,0 +1,63 @@
+from flask import Response, stream_with_context
+
+from fsnd_common.json_provider import dumps
+
+# Rows fetched from the database cursor, and encoded into one chunk of the
+# response body, at a time.
+STREAM_CHUNK_SIZE = 500
+STREAM_FORMATS = ('json', 'ndjson')
+
+'''
+stream_format(request)
+    the streaming mode a request opted into, or None for a regular response
+    ?stream=json streams the usual response object, ?stream=ndjson (or an
+    Accept of application/x-ndjson) streams one question per line
+'''
+def stream_format(request):
+  format = request.args.get('stream')
+  if format is None and request.accept_mimetypes.best == 'application/x-ndjson':
+    format = 'ndjson'
+  return format if format in STREAM_FORMATS else None
+
+'''
+stream_questions(query, format, **fields)
+    a chunked response of the questions in query, read from a server side
+    cursor STREAM_CHUNK_SIZE rows at a time and encoded row by row, so
+    memory stays flat however many questions match
+    json
+        {"success": true, <fields>, "questions": [...], "total_questions": n}
+        total_questions comes last, since it is only known once every row
+        has been sent
+    ndjson
+        the formatted questions, one per line
+'''
+def stream_questions(query, format, **fields):
+  rows = query.yield_per(STREAM_CHUNK_SIZE)
+  if format == 'ndjson':
+    return Response(stream_with_context(_ndjson_chunks(rows)), mimetype='application/x-ndjson')
+  return Response(stream_with_context(_json_chunks(rows, fields)), mimetype='application/json')
+
+def _ndjson_chunks(rows):
+  chunk = []
+  for question in rows:
+    chunk.append(dumps(question.format()))
+    if len(chunk) == STREAM_CHUNK_SIZE:
+      yield b'\n'.join(chunk) + b'\n'
+      chunk = []
+  if chunk:
+    yield b'\n'.join(chunk) + b'\n'
+
+def _json_chunks(rows, fields):
+  head = dumps(dict(success=True, **fields))
+  yield head[:-1] + b',"questions":['
+  total = 0
+  chunk = []
+  for question in rows:
+    chunk.append(dumps(question.format()))
+    total += 1
+    if len(chunk) == STREAM_CHUNK_SIZE:
+      yield (b',' if total > len(chunk) else b'') + b','.join(chunk)
+      chunk = []
+  if chunk:
+    yield (b',' if total > len(chunk) else b'') + b','.join(chunk)
+  yield b'],"total_questions":%d}' % total
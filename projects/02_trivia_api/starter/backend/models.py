@@ -1,4 +1,5 @@
 import os
+import hashlib
 from sqlalchemy import Column, String, Integer, create_engine
 from flask_sqlalchemy import SQLAlchemy
 import json
@@ -19,9 +20,23 @@ def setup_db(app, database_path=database_path):
     db.create_all()
 
 '''
-Question
+normalize_question(text)
+    the form two questions are compared in to find duplicates:
+    lowercase, with runs of whitespace collapsed to a single space
+question_digest(text)
+    sha1 of the normalized text, stored as Question.question_hash
+'''
+def normalize_question(text):
+  return ' '.join(text.split()).lower()
+
+def question_digest(text):
+  return hashlib.sha1(normalize_question(text).encode('utf-8')).hexdigest()
 
 '''
+Question
+    question_hash has a unique index, so the database itself refuses a
+    question that is already in the bank
+'''
 class Question(db.Model):  
   __tablename__ = 'questions'
 
@@ -30,9 +45,11 @@ class Question(db.Model):
   answer = Column(String)
   category = Column(String)
   difficulty = Column(Integer)
+  question_hash = Column(String(40), unique=True)
 
   def __init__(self, question, answer, category, difficulty):
     self.question = question
+    self.question_hash = question_digest(question)
     self.answer = answer
     self.category = category
     self.difficulty = difficulty
@@ -1,9 +1,12 @@
 import os
 import unittest
+import gzip
 import json
+import uuid
 from flask_sqlalchemy import SQLAlchemy
 
 from flaskr import create_app
+from fsnd_common.profiling import assert_max_queries
 from models import setup_db, Question, Category
 
 #  Trivial App test case class
@@ -57,6 +60,15 @@ class TriviaTestCase(unittest.TestCase):
 
         self.assertEqual(res.status_code, 404)
         self.assertEqual(data['message'], 'resource not found')
+
+    # Tests a matching If-None-Match skips the categories body
+    def test_get_categories_not_modified(self):
+        res = self.client().get('/categories')
+        etag = res.headers['ETag']
+        res = self.client().get('/categories', headers={'If-None-Match': etag})
+
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.data, b'')
     
     '''
         GET /questions
@@ -79,6 +91,51 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(res.status_code, 404)
         self.assertEqual(data['message'], 'resource not found')
 
+    # Tests a client accepting gzip gets a large page of questions compressed
+    def test_get_paginated_questions_gzip(self):
+        res = self.client().get('/questions?per_page=50', headers={'Accept-Encoding': 'gzip'})
+        data = json.loads(gzip.decompress(res.data))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', res.headers['Vary'])
+        self.assertTrue(len(data['questions']))
+
+    # Tests the page size can be chosen per request
+    def test_get_paginated_questions_per_page(self):
+        res = self.client().get('/questions?per_page=5')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(data['questions']), 5)
+        self.assertGreater(data['total_questions'], 5)
+
+    # Tests keyset pagination continues after the cursor of the previous page
+    def test_get_paginated_questions_after_cursor(self):
+        first_page = json.loads(self.client().get('/questions?per_page=5').data)
+        res = self.client().get(f"/questions?per_page=5&after={first_page['next_cursor']}")
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(len(data['questions']))
+        self.assertTrue(all(question['id'] > first_page['next_cursor'] for question in data['questions']))
+
+    # Tests a malformed cursor is rejected instead of restarting at page 1
+    def test_400_get_paginated_questions_malformed_cursor(self):
+        res = self.client().get('/questions?after=abc')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(data['message'], 'bad request')
+
+    # Tests pages past the last question are not found
+    def test_404_get_paginated_questions_beyond_last_page(self):
+        res = self.client().get('/questions?page=1000')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 404)
+        self.assertEqual(data['message'], 'resource not found')
+
     '''
         DELETE /questions/<question_id>
     '''
@@ -106,6 +163,55 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(res.status_code, 200)
         self.assertEqual(data['success'], True)
 
+    # Tests a question already in the bank, written differently, is rejected
+    def test_422_add_duplicate_question(self):
+        question = Question.query.first()
+        duplicate = dict(self.new_question, question='  ' + question.question.upper())
+        res = self.client().post('/questions', json=duplicate)
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 422)
+        self.assertEqual(data['message'], 'unprocessable')
+
+    '''
+        POST /questions/import
+    '''
+    # Tests a JSON Lines import skips duplicates and rejects invalid records
+    def test_import_questions_jsonl(self):
+        question = f'Which river runs through Cairo? {uuid.uuid4()}'
+        records = [
+            {'question': question, 'answer': 'The Nile', 'category': 3, 'difficulty': 1},
+            {'question': '  ' + question.upper() + ' ', 'answer': 'Nile', 'category': 3, 'difficulty': 1},
+            {'question': 'No answer', 'category': 3, 'difficulty': 1}
+        ]
+        body = '\n'.join(json.dumps(record) for record in records) + '\nnot json\n'
+        res = self.client().post('/questions/import', data=body, content_type='application/x-ndjson')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['inserted'], 1)
+        self.assertEqual(data['duplicates'], 1)
+        self.assertEqual(data['rejected'], 2)
+        self.assertEqual([error['line'] for error in data['errors']], [3, 4])
+        self.assertEqual(Question.query.filter(Question.question == question).count(), 1)
+
+    # Tests a CSV import in several batches
+    def test_import_questions_csv(self):
+        tag = uuid.uuid4()
+        body = 'question,answer,category,difficulty\n' + ''.join(
+            f'"Question {i}, {tag}",Answer {i},1,2\n' for i in range(5))
+        res = self.client().post('/questions/import?batch_size=2', data=body, content_type='text/csv')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['inserted'], 5)
+        self.assertEqual([batch['inserted'] for batch in data['batches']], [2, 2, 1])
+
+    # Tests an unknown import format is a bad request
+    def test_400_import_questions_unknown_format(self):
+        res = self.client().post('/questions/import', data='{}', content_type='application/xml')
+        self.assertEqual(res.status_code, 400)
+
     '''
         Search questions
     '''
@@ -126,6 +232,19 @@ class TriviaTestCase(unittest.TestCase):
         data = json.loads(res.data)
         
         self.assertEqual(data['total_questions'], 0)
+
+    # Tests a streamed search returns the same questions as a regular one
+    def test_search_question_streamed(self):
+        res = self.client().post('/questions/search?stream=json', json={'searchTerm': 'the'})
+        data = json.loads(res.data)
+        expected = json.loads(self.client().post('/questions/search', json={'searchTerm': 'the'}).data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['total_questions'], expected['total_questions'])
+        self.assertEqual(
+            sorted(question['id'] for question in data['questions']),
+            sorted(question['id'] for question in expected['questions']))
+        self.assertIsNone(data['current_category'])
     
     '''
         GET questions by category
@@ -141,6 +260,17 @@ class TriviaTestCase(unittest.TestCase):
         self.assertTrue(data['questions'])
         self.assertTrue(data['total_questions'])
         self.assertEqual(data['current_category'], {f'{category.id}': category.type})
+
+    # Tests questions of a category streamed as one JSON object per line
+    def test_get_categorized_questions_ndjson(self):
+        category = Category.query.first()
+        res = self.client().get(f'/categories/{category.id}/questions?stream=ndjson')
+        questions = [json.loads(line) for line in res.data.decode('utf-8').splitlines()]
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.mimetype, 'application/x-ndjson')
+        self.assertTrue(questions)
+        self.assertTrue(all(str(question['category']) == str(category.id) for question in questions))
     
     # Test category not found 
     def test_404_category_not_found(self):
@@ -163,6 +293,80 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(data['success'], True)
         self.assertTrue(data['question'])
 
+    # Tests quiz questions come from the category and skip played questions
+    def test_get_quiz_question_in_category(self):
+        category = Category.query.first()
+        played = [question.id for question in Question.query.filter(Question.category == str(category.id))][1:]
+        request_data = {
+            'previous_questions': played,
+            'quiz_category': {'id': category.id}
+        }
+        res = self.client().post('/quizzes', json=request_data)
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(str(data['question']['category']), str(category.id))
+        self.assertNotIn(data['question']['id'], played)
+
+    # Tests no question is returned once the whole category was played
+    def test_get_quiz_question_category_exhausted(self):
+        category = Category.query.first()
+        played = [question.id for question in Question.query.filter(Question.category == str(category.id))]
+        request_data = {
+            'previous_questions': played,
+            'quiz_category': {'id': category.id}
+        }
+        res = self.client().post('/quizzes', json=request_data)
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertNotIn('question', data)
+
+
+    '''
+        Query budgets
+    '''
+    # Tests cached categories are served without touching the database
+    def test_get_categories_query_budget(self):
+        self.client().get('/categories')
+        with assert_max_queries(0):
+            res = self.client().get('/categories')
+
+        self.assertEqual(res.status_code, 200)
+
+    # Tests a page of questions costs one query once the count and categories are cached
+    def test_get_paginated_questions_query_budget(self):
+        self.client().get('/questions')
+        with assert_max_queries(1):
+            res = self.client().get('/questions?page=2')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.headers['X-Query-Count'], '1')
+
+    # Tests the profiler reads its settings from the app config
+    def test_profiler_settings_from_config(self):
+        app = create_app({'PROFILE_HEADERS': False, 'PROFILE_SLOW_REQUEST_MS': 0, 'PROFILE_TOP_STATEMENTS': 1})
+        setup_db(app, self.database_path)
+        with self.assertLogs(app.logger, 'WARNING') as logs:
+            res = app.test_client().get('/questions')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertNotIn('X-Query-Count', res.headers)
+        self.assertIn('slow request GET /questions', logs.output[0])
+        self.assertEqual(logs.output[0].count(' ms  '), 1)
+
+    # Tests drawing a quiz question loads only the question drawn
+    def test_get_quiz_question_query_budget(self):
+        request_data = {
+            'previous_questions': [],
+            'quiz_category': {'id': 0}
+        }
+        self.client().post('/quizzes', json=request_data)
+        with assert_max_queries(1):
+            res = self.client().post('/quizzes', json=request_data)
+
+        self.assertEqual(res.status_code, 200)
 
 # Make the tests conveniently executable
 if __name__ == "__main__":
@@ -0,0 +1,104 @@
+import base64
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from Crypto.PublicKey import RSA
+from jose import jwt
+
+
+def _b64(number):
+    data = number.to_bytes((number.bit_length() + 7) // 8, 'big')
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+'''
+SigningKey
+An RSA key pair that mints RS256 tokens the way Auth0 does
+'''
+class SigningKey:
+    def __init__(self, kid='bench-key', bits=2048):
+        self.kid = kid
+        self.key = RSA.generate(bits)
+        self.private_pem = self.key.export_key().decode('ascii')
+
+    def jwk(self):
+        return {
+            'kty': 'RSA',
+            'kid': self.kid,
+            'use': 'sig',
+            'alg': 'RS256',
+            'n': _b64(self.key.n),
+            'e': _b64(self.key.e)
+        }
+
+    def token(self, domain, audience, permissions=(), expires_in=3600, subject='auth0|bench'):
+        now = int(time.time())
+        claims = {
+            'iss': 'https://' + domain + '/',
+            'sub': subject,
+            'aud': audience,
+            'iat': now,
+            'exp': now + expires_in,
+            'permissions': list(permissions)
+        }
+        return jwt.encode(claims, self.private_pem, algorithm='RS256', headers={'kid': self.kid})
+
+
+'''
+StubJWKSServer
+Serves a key set on http://127.0.0.1:<port>/.well-known/jwks.json from a
+background thread, waiting `latency` seconds before every response to
+stand in for the round trip to the identity provider
+'''
+class StubJWKSServer:
+    def __init__(self, keys, latency=0.0):
+        body = json.dumps({'keys': [key.jwk() for key in keys]}).encode('utf-8')
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests += 1
+                time.sleep(latency)
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = HTTPServer(('127.0.0.1', 0), Handler)
+        self.url = 'http://127.0.0.1:{}/.well-known/jwks.json'.format(self.httpd.server_port)
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+INGREDIENTS = [
+    ('espresso', 'brown'), ('milk', 'white'), ('foam', 'beige'), ('water', 'blue'),
+    ('chocolate', 'darkbrown'), ('caramel', 'gold'), ('cream', 'ivory'), ('ice', 'clear')
+]
+STYLES = ['Latte', 'Mocha', 'Flat White', 'Macchiato', 'Cortado', 'Americano', 'Frappe']
+
+'''
+drink_rows(drinks, seed)
+Yields `drinks` deterministic rows for the drink table, each with a unique
+title and a recipe of one to four ingredients; the same seed always yields
+the same rows
+'''
+def drink_rows(drinks, seed=0):
+    rng = random.Random(seed)
+    for i in range(1, drinks + 1):
+        recipe = [{'name': name, 'color': color, 'parts': rng.randint(1, 3)}
+                  for name, color in rng.sample(INGREDIENTS, rng.randint(1, 4))]
+        yield {'id': i, 'title': '{} {}'.format(rng.choice(STYLES), i), 'recipe': json.dumps(recipe)}
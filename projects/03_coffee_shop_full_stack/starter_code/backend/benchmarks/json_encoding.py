@@ -0,0 +1,71 @@
+'''
+Compares encoders on the heaviest coffee shop response, the full drink
+menu in its long form, and the pre-encoded fragments the menu cache uses.
+
+    $ python -m benchmarks.json_encoding --drinks 500 --repeat 200
+'''
+import argparse
+import json
+import sys
+import time
+
+import flask
+from flask import Flask
+
+from fsnd_common import json_provider
+from src.database.models import Drink
+
+
+def menu(drinks):
+    menu = []
+    for i in range(drinks):
+        recipe = [
+            {'name': 'espresso', 'color': 'brown', 'parts': 1 + i % 3},
+            {'name': 'milk', 'color': 'white', 'parts': 2},
+            {'name': 'foam', 'color': 'beige', 'parts': 1}
+        ]
+        menu.append(Drink(id=i + 1, title='drink {}'.format(i), recipe=json.dumps(recipe)))
+    return menu
+
+
+def measure(encode, repeat):
+    size = len(encode())
+    start = time.perf_counter()
+    for _ in range(repeat):
+        encode()
+    return (time.perf_counter() - start) / repeat, size
+
+
+def run(drinks, repeat):
+    payload = {'success': True, 'drinks': [drink.long() for drink in menu(drinks)]}
+    fragments = menu(drinks)
+    app = Flask(__name__)
+    providers = [json_provider.StdlibJSONProvider]
+    if json_provider.orjson is not None:
+        providers.append(json_provider.OrjsonJSONProvider)
+    else:
+        print('orjson is not installed, skipping it')
+
+    encoders = {'flask.jsonify': lambda: flask.jsonify(payload).get_data()}
+    for provider in providers:
+        encoders[provider.name] = (lambda provider: lambda: provider.dumps(payload))(provider(app))
+    encoders['fragments'] = lambda: ('{"success": true, "drinks": [%s]}' % ', '.join(
+        drink.long_json() for drink in fragments)).encode('utf-8')
+
+    print('{} drinks, {} runs each'.format(drinks, repeat))
+    with app.app_context():
+        baseline = None
+        for name, encode in encoders.items():
+            seconds, size = measure(encode, repeat)
+            baseline = baseline or seconds
+            print('{:<14} {:9.1f} us   {:7.1f} KB   {:5.2f}x'.format(
+                name, seconds * 1e6, size / 1024, baseline / seconds))
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--drinks', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+    sys.exit(run(args.drinks, args.repeat))
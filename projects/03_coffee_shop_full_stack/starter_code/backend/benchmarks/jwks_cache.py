@@ -0,0 +1,58 @@
+'''
+Benchmarks the auth overhead of verify_decode_jwt with and without the
+JWKS cache, against a local stub identity provider with simulated latency.
+
+    $ python -m benchmarks.jwks_cache --latency 0.05 --requests 200
+'''
+import argparse
+import statistics
+import sys
+import time
+
+from src.auth import auth
+from fsnd_common.jwks import JWKSCache
+from benchmarks import SigningKey, StubJWKSServer
+
+
+def measure(cache, token, requests):
+    auth.jwks = cache
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        auth.verify_decode_jwt(token)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def report(name, timings):
+    timings = sorted(timings)
+    print('{:<10} mean {:9.1f} us   p50 {:9.1f} us   p99 {:9.1f} us'.format(
+        name,
+        statistics.mean(timings) * 1e6,
+        timings[len(timings) // 2] * 1e6,
+        timings[int(len(timings) * 0.99) - 1] * 1e6))
+
+
+def run(latency, requests):
+    key = SigningKey()
+    token = key.token(auth.AUTH0_DOMAIN, auth.API_AUDIENCE)
+    with StubJWKSServer([key], latency=latency) as server:
+        # ttl=0 refetches the key set on every call, like the uncached code did.
+        uncached = measure(JWKSCache(server.url, ttl=0, refresh_ahead=0, min_refetch_interval=0), token, requests)
+        fetches = server.requests
+        cached = measure(JWKSCache(server.url), token, requests)
+        cached_fetches = server.requests - fetches
+
+    print('{} requests, {:.0f} ms simulated identity provider latency'.format(requests, latency * 1000))
+    report('uncached', uncached)
+    report('cached', cached)
+    print('key set fetches: uncached {}, cached {}'.format(fetches, cached_fetches))
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds added to every key set fetch')
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+    sys.exit(run(args.latency, args.requests))
@@ -0,0 +1,60 @@
+'''
+Load test replaying the public coffee shop menu.
+
+Seeds a temporary sqlite database with deterministic drinks, then sends a
+mix of full GET /drinks requests and revalidations carrying the menu's
+ETag, and prints p50/p95/p99 latency, throughput and peak RSS per
+endpoint as JSON.
+
+    $ python -m benchmarks.load --drinks 10000 --requests 2000 --output load.json
+'''
+import argparse
+import os
+import sys
+import tempfile
+from itertools import islice
+
+from benchmarks import drink_rows
+from fsnd_common.loadtest import Endpoint, Request, add_arguments, run_mix, write_results
+
+BATCH_SIZE = 5000
+
+
+def seed(db, Drink, drinks, seed=0):
+    db.drop_all()
+    db.create_all()
+    rows = drink_rows(drinks, seed)
+    while True:
+        batch = list(islice(rows, BATCH_SIZE))
+        if not batch:
+            break
+        db.session.execute(Drink.__table__.insert(), batch)
+    db.session.commit()
+
+
+def run(args):
+    # The app binds its database on import, so point it at the benchmark one first.
+    os.environ['COFFEE_DATABASE_URL'] = 'sqlite:///' + args.database
+    from src.api import app
+    from src.database.models import db, Drink
+
+    with app.app_context():
+        seed(db, Drink, args.drinks, args.seed)
+    etag = app.test_client().get('/drinks').headers['ETag']
+    endpoints = [
+        Endpoint('GET /drinks', 1, lambda rng: Request('GET', '/drinks')),
+        Endpoint('GET /drinks (If-None-Match)', 3, lambda rng: Request('GET', '/drinks', headers={'If-None-Match': etag})),
+    ]
+    results = run_mix(app, endpoints, args.requests, seed=args.seed, warmup=args.warmup,
+                      server=args.server, scale={'drinks': args.drinks}, name='coffee_shop')
+    write_results(results, args.output)
+    return 1 if results['total']['errors'] else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--drinks', type=int, default=1000)
+    parser.add_argument('--database', default=os.path.join(tempfile.gettempdir(), 'coffee_bench.db'),
+                        help='sqlite file to seed, dropped and recreated on every run')
+    add_arguments(parser)
+    sys.exit(run(parser.parse_args()))
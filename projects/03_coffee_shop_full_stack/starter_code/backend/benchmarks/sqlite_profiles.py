@@ -0,0 +1,114 @@
+'''
+Benchmarks concurrent reads and writes against the file-backed sqlite
+database under each storage profile (see models.STORAGE_PROFILES).
+Every worker is a separate process, like a gunicorn worker, with its own
+engine on a shared temporary database file.
+
+    $ python -m benchmarks.sqlite_profiles --readers 6 --writers 2 --duration 5
+'''
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+from flask import Flask
+from sqlalchemy.exc import OperationalError
+
+from src.database import models
+from src.database.models import db, Drink
+
+
+def create_app(database_file, profile):
+    app = Flask(__name__)
+    models.setup_db(app, 'sqlite:///' + database_file, profile)
+    return app
+
+
+def populate(database_file, profile, drinks):
+    app = create_app(database_file, profile)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        for i in range(drinks):
+            db.session.add(Drink(
+                title='drink {}'.format(i),
+                recipe=json.dumps([{'name': 'water', 'color': 'blue', 'parts': 1}])))
+        db.session.commit()
+        db.engine.dispose()
+
+
+def worker(database_file, profile, role, index, drinks, start_at, stop_at, results):
+    app = create_app(database_file, profile)
+    ops = errors = 0
+    with app.app_context():
+        while time.time() < start_at:
+            time.sleep(0.001)
+        while time.time() < stop_at:
+            try:
+                if role == 'read':
+                    Drink.query.order_by(Drink.id).limit(drinks).all()
+                else:
+                    drink = Drink(
+                        title='{} {} {}'.format(role, index, ops),
+                        recipe=json.dumps([{'name': 'milk', 'color': 'white', 'parts': ops % 4 + 1}]))
+                    db.session.add(drink)
+                    db.session.commit()
+                ops += 1
+            except OperationalError:
+                db.session.rollback()
+                errors += 1
+            finally:
+                db.session.remove()
+    results.put((role, ops, errors))
+
+
+def run_profile(profile, readers, writers, duration, drinks):
+    with tempfile.TemporaryDirectory() as directory:
+        database_file = os.path.join(directory, 'bench.db')
+        populate(database_file, profile, drinks)
+        results = multiprocessing.Queue()
+        start_at = time.time() + 1.0
+        stop_at = start_at + duration
+        roles = ['read'] * readers + ['write'] * writers
+        processes = [
+            multiprocessing.Process(
+                target=worker,
+                args=(database_file, profile, role, index, drinks, start_at, stop_at, results))
+            for index, role in enumerate(roles)
+        ]
+        for process in processes:
+            process.start()
+        totals = {'read': [0, 0], 'write': [0, 0]}
+        for _ in processes:
+            role, ops, errors = results.get()
+            totals[role][0] += ops
+            totals[role][1] += errors
+        for process in processes:
+            process.join()
+
+    print('{:<8} reads {:8.0f}/s   writes {:7.0f}/s   lock errors {}'.format(
+        profile,
+        totals['read'][0] / duration,
+        totals['write'][0] / duration,
+        totals['read'][1] + totals['write'][1]))
+
+
+def run(profiles, readers, writers, duration, drinks):
+    print('{} readers, {} writers, {} s per profile, {} drinks'.format(readers, writers, duration, drinks))
+    for profile in profiles:
+        run_profile(profile, readers, writers, duration, drinks)
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--profiles', nargs='+', default=sorted(models.STORAGE_PROFILES), choices=sorted(models.STORAGE_PROFILES))
+    parser.add_argument('--readers', type=int, default=6)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--drinks', type=int, default=50)
+    args = parser.parse_args()
+    sys.exit(run(args.profiles, args.readers, args.writers, args.duration, args.drinks))
@@ -1,15 +1,21 @@
 import os
-from flask import Flask, request, jsonify, abort
+from flask import Flask, request, abort
 from sqlalchemy import exc
 import json
 from flask_cors import CORS
 
 from .database.models import db_drop_and_create_all, setup_db, Drink
-from .auth.auth import AuthError, requires_auth
+from .database.menu import MenuCache
+from .auth.auth import AuthError, permissions, requires_auth
+from fsnd_common.json_provider import install_json_provider, jsonify
 
 app = Flask(__name__)
 setup_db(app)
 CORS(app)
+install_json_provider(app)
+
+# The public menu, served pre-encoded until a drink is written.
+menu = MenuCache()
 
 '''
 @TODO uncomment the following line to initialize the datbase
@@ -26,7 +32,16 @@ CORS(app)
         it should contain only the drink.short() data representation
     returns status code 200 and json {"success": True, "drinks": drinks} where drinks is the list of drinks
         or appropriate status code indicating reason for failure
+    the body comes pre-encoded from the menu cache with a strong ETag,
+        a request whose If-None-Match carries it gets an empty 304
 '''
+@app.route('/drinks')
+def get_drinks():
+    body, etag = menu.get()
+    response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
 
 
 '''
@@ -37,6 +52,14 @@ CORS(app)
     returns status code 200 and json {"success": True, "drinks": drinks} where drinks is the list of drinks
         or appropriate status code indicating reason for failure
 '''
+@app.route('/drinks-detail')
+@requires_auth('get:drinks-detail')
+def get_drinks_detail(payload):
+    drinks = Drink.query.order_by(Drink.id).all()
+    return jsonify({
+        'success': True,
+        'drinks': [drink.long() for drink in drinks]
+    })
 
 
 '''
@@ -108,3 +131,15 @@ def unprocessable(error):
 @TODO implement error handler for AuthError
     error handler should conform to general task above 
 '''
+@app.errorhandler(AuthError)
+def auth_error(error):
+    return jsonify({
+                    "success": False,
+                    "error": error.status_code,
+                    "message": error.error['description']
+                    }), error.status_code
+
+
+# Every route has registered the permissions it requires by now, no scope
+# can be added at request time.
+permissions.freeze()
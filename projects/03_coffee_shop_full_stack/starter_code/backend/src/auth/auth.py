@@ -2,13 +2,24 @@ import json
 from flask import request, _request_ctx_stack
 from functools import wraps
 from jose import jwt
-from urllib.request import urlopen
+
+from fsnd_common.jwks import JWKSCache
+from fsnd_common.token_cache import VerifiedTokenCache
+from .rbac import PermissionRegistry, Grant
 
 
 AUTH0_DOMAIN = 'udacity-fsnd.auth0.com'
 ALGORITHMS = ['RS256']
 API_AUDIENCE = 'dev'
 
+# Signing keys of AUTH0_DOMAIN, fetched once and refreshed in the background
+# instead of on every request.
+jwks = JWKSCache(f'https://{AUTH0_DOMAIN}/.well-known/jwks.json')
+# Grants of tokens that already passed verify_decode_jwt, until they expire.
+verified_tokens = VerifiedTokenCache()
+# Permission scopes required by the routes, one bit each.
+permissions = PermissionRegistry()
+
 ## AuthError Exception
 '''
 AuthError Exception
@@ -31,7 +42,33 @@ class AuthError(Exception):
     return the token part of the header
 '''
 def get_token_auth_header():
-   raise Exception('Not Implemented')
+    auth = request.headers.get('Authorization', None)
+    if not auth:
+        raise AuthError({
+            'code': 'authorization_header_missing',
+            'description': 'Authorization header is expected.'
+        }, 401)
+
+    parts = auth.split()
+    if not parts or parts[0].lower() != 'bearer':
+        raise AuthError({
+            'code': 'invalid_header',
+            'description': 'Authorization header must start with "Bearer".'
+        }, 401)
+
+    elif len(parts) == 1:
+        raise AuthError({
+            'code': 'invalid_header',
+            'description': 'Token not found.'
+        }, 401)
+
+    elif len(parts) > 2:
+        raise AuthError({
+            'code': 'invalid_header',
+            'description': 'Authorization header must be bearer token.'
+        }, 401)
+
+    return parts[1]
 
 '''
 @TODO implement check_permissions(permission, payload) method
@@ -42,10 +79,32 @@ def get_token_auth_header():
     it should raise an AuthError if permissions are not included in the payload
         !!NOTE check your RBAC settings in Auth0
     it should raise an AuthError if the requested permission string is not in the payload permissions array
+        wildcard and compound permissions are supported, see PermissionRegistry
+        a permission no route registered is never granted
     return true otherwise
 '''
 def check_permissions(permission, payload):
-    raise Exception('Not Implemented')
+    authorize(Grant(payload, permissions), permissions.mask(permission))
+    return True
+
+'''
+authorize(grant, required)
+    check_permissions for a precompiled grant and required bitmask
+    required is None for a permission the registry doesn't know
+    this is what requires_auth runs on every request
+'''
+def authorize(grant, required):
+    if not grant.claimed:
+        raise AuthError({
+            'code': 'invalid_claims',
+            'description': 'Permissions not included in JWT.'
+        }, 400)
+
+    if required is None or not grant.allows(required):
+        raise AuthError({
+            'code': 'unauthorized',
+            'description': 'Permission not found.'
+        }, 403)
 
 '''
 @TODO implement verify_decode_jwt(token) method
@@ -54,6 +113,7 @@ def check_permissions(permission, payload):
 
     it should be an Auth0 token with key id (kid)
     it should verify the token using Auth0 /.well-known/jwks.json
+        the key set comes from the jwks cache, see JWKSCache
     it should decode the payload from the token
     it should validate the claims
     return the decoded payload
@@ -61,7 +121,52 @@ def check_permissions(permission, payload):
     !!NOTE urlopen has a common certificate error described here: https://stackoverflow.com/questions/50236117/scraping-ssl-certificate-verify-failed-error-for-http-en-wikipedia-org
 '''
 def verify_decode_jwt(token):
-    raise Exception('Not Implemented')
+    try:
+        unverified_header = jwt.get_unverified_header(token)
+    except jwt.JWTError:
+        raise AuthError({
+            'code': 'invalid_header',
+            'description': 'Authorization malformed.'
+        }, 401)
+    if 'kid' not in unverified_header:
+        raise AuthError({
+            'code': 'invalid_header',
+            'description': 'Authorization malformed.'
+        }, 401)
+
+    rsa_key = jwks.get_key(unverified_header['kid'])
+    if rsa_key:
+        try:
+            payload = jwt.decode(
+                token,
+                rsa_key,
+                algorithms=ALGORITHMS,
+                audience=API_AUDIENCE,
+                issuer='https://' + AUTH0_DOMAIN + '/'
+            )
+
+            return payload
+
+        except jwt.ExpiredSignatureError:
+            raise AuthError({
+                'code': 'token_expired',
+                'description': 'Token expired.'
+            }, 401)
+
+        except jwt.JWTClaimsError:
+            raise AuthError({
+                'code': 'invalid_claims',
+                'description': 'Incorrect claims. Please, check the audience and issuer.'
+            }, 401)
+        except Exception:
+            raise AuthError({
+                'code': 'invalid_header',
+                'description': 'Unable to parse authentication token.'
+            }, 400)
+    raise AuthError({
+                'code': 'invalid_header',
+                'description': 'Unable to find the appropriate key.'
+            }, 400)
 
 '''
 @TODO implement @requires_auth(permission) decorator method
@@ -70,17 +175,26 @@ def verify_decode_jwt(token):
 
     it should use the get_token_auth_header method to get the token
     it should use the verify_decode_jwt method to decode the jwt
+        tokens verified before are served from verified_tokens instead
     it should use the check_permissions method validate claims and check the requested permission
+        the permission is registered when the route is decorated and each token's
+        permissions are compiled once, so the check is a single bit test
     return the decorator which passes the decoded payload to the decorated method
 '''
 def requires_auth(permission=''):
+    required = permissions.register(permission)
+
     def requires_auth_decorator(f):
         @wraps(f)
         def wrapper(*args, **kwargs):
             token = get_token_auth_header()
-            payload = verify_decode_jwt(token)
-            check_permissions(permission, payload)
-            return f(payload, *args, **kwargs)
+            grant = verified_tokens.get(token)
+            if grant is None:
+                payload = verify_decode_jwt(token)
+                grant = Grant(payload, permissions)
+                verified_tokens.put(token, grant, payload.get('exp'))
+            authorize(grant, required)
+            return f(grant.payload, *args, **kwargs)
 
         return wrapper
     return requires_auth_decorator
\ No newline at end of file
@@ -0,0 +1,97 @@
+import threading
+from fnmatch import fnmatchcase
+
+
+'''
+PermissionRegistry
+Gives every permission scope a route requires its own bit
+
+    register(permission)
+        returns the bitmask of a required permission; a compound permission
+        lists several scopes separated by spaces, all of which are required
+        routes register their permissions when they are decorated, at import time
+    freeze()
+        called once every route is decorated; registering a new scope after
+        that is a programming error and raises RuntimeError
+    mask(permission)
+        the bitmask of an already registered permission, or None if any of
+        its scopes is unknown
+    compile(permissions)
+        returns the bitmask of the scopes granted by a token's permissions,
+        with the registry version it was compiled against
+        a granted permission may use * wildcards, i.e. '*:drinks' or 'get:*',
+        which are expanded against the registered scopes once, here
+'''
+class PermissionRegistry:
+    def __init__(self):
+        self.bits = {}
+        self.frozen = False
+        self.lock = threading.Lock()
+
+    @property
+    def version(self):
+        return len(self.bits)
+
+    def register(self, permission):
+        mask = 0
+        with self.lock:
+            for scope in permission.split():
+                if scope not in self.bits:
+                    if self.frozen:
+                        raise RuntimeError('permission {!r} registered after the registry was frozen'.format(scope))
+                    self.bits[scope] = 1 << len(self.bits)
+                mask |= self.bits[scope]
+        return mask
+
+    def freeze(self):
+        with self.lock:
+            self.frozen = True
+
+    def mask(self, permission):
+        mask = 0
+        with self.lock:
+            for scope in permission.split():
+                if scope not in self.bits:
+                    return None
+                mask |= self.bits[scope]
+        return mask
+
+    def compile(self, permissions):
+        mask = 0
+        with self.lock:
+            for permission in permissions:
+                if '*' in permission:
+                    for scope, bit in self.bits.items():
+                        if fnmatchcase(scope, permission):
+                            mask |= bit
+                else:
+                    mask |= self.bits.get(permission, 0)
+            return self.version, mask
+
+
+'''
+Grant
+A verified token payload together with its compiled permission bitmask
+
+    allows(required) is a single bit test against a mask from register()
+    the mask is recompiled if scopes were registered after it was built,
+    which only happens before the registry is frozen
+'''
+class Grant:
+    def __init__(self, payload, registry):
+        self.payload = payload
+        self.registry = registry
+        self.claimed = 'permissions' in payload
+        self._compiled = registry.compile(payload.get('permissions', ()))
+
+    @property
+    def mask(self):
+        return self._compiled[1]
+
+    def allows(self, required):
+        # The version and mask are read and replaced as one tuple, so a
+        # concurrent recompile can't pair a new version with an old mask.
+        version, mask = self._compiled
+        if version != self.registry.version:
+            version, mask = self._compiled = self.registry.compile(self.payload.get('permissions', ()))
+        return mask & required == required
@@ -0,0 +1,46 @@
+import hashlib
+import threading
+import time
+
+from . import models
+from .models import Drink
+
+
+'''
+MenuCache
+the public drink menu, pre-encoded as the GET /drinks response body
+
+    get() returns the body bytes and their strong ETag
+    the body is built from Drink.short_json() fragments and reused until a
+    Drink write method marks the menu dirty (see models.menu_version), or
+    until ttl seconds passed, which bounds how stale other workers can be
+    in steady state serving the menu needs no database access and no encoding
+'''
+class MenuCache:
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.version = None
+        self.built_at = None
+        self.body = None
+        self.etag = None
+
+    def get(self):
+        with self.lock:
+            if self.version != models.menu_version or time.monotonic() - self.built_at >= self.ttl:
+                self._build()
+            return self.body, self.etag
+
+    def invalidate(self):
+        with self.lock:
+            self.version = None
+
+    def _build(self):
+        # Read the version first: a write committed while building bumps it
+        # again, so the next get() rebuilds instead of keeping stale drinks.
+        version = models.menu_version
+        drinks = ', '.join(drink.short_json() for drink in Drink.query.order_by(Drink.id))
+        self.body = ('{"success": true, "drinks": [%s]}' % drinks).encode('utf-8')
+        self.etag = hashlib.sha1(self.body).hexdigest()
+        self.version = version
+        self.built_at = time.monotonic()
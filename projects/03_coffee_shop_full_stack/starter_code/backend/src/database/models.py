@@ -1,23 +1,85 @@
 import os
-from sqlalchemy import Column, String, Integer
+from functools import lru_cache
+from sqlalchemy import Column, String, Integer, event
+from sqlalchemy.pool import QueuePool
 from flask_sqlalchemy import SQLAlchemy
 import json
 
 database_filename = "database.db"
 project_dir = os.path.dirname(os.path.abspath(__file__))
-database_path = "sqlite:///{}".format(os.path.join(project_dir, database_filename))
+# COFFEE_DATABASE_URL points the app at another database, e.g. for benchmarks.
+database_path = os.environ.get(
+    'COFFEE_DATABASE_URL', "sqlite:///{}".format(os.path.join(project_dir, database_filename)))
+
+'''
+STORAGE_PROFILES
+    sqlite settings for the file-backed database, chosen with COFFEE_DB_PROFILE
+    default
+        sqlite's own settings: rollback journal, fsync on every commit
+    wal
+        write-ahead logging so readers don't block on a writer, fsync at
+        checkpoints only, a bigger page cache and memory-mapped reads, and a
+        busy timeout instead of failing when another worker holds the write lock
+        connections are pooled instead of opened per request
+'''
+STORAGE_PROFILES = {
+    'default': {
+        'pragmas': {},
+        'engine_options': {}
+    },
+    'wal': {
+        'pragmas': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'cache_size': -64000,
+            'mmap_size': 268435456,
+            'temp_store': 'MEMORY',
+            'busy_timeout': 5000
+        },
+        'engine_options': {
+            'poolclass': QueuePool,
+            'pool_size': 5,
+            'max_overflow': 10,
+            'connect_args': {'check_same_thread': False, 'timeout': 5}
+        }
+    }
+}
+storage_profile = os.environ.get('COFFEE_DB_PROFILE', 'wal')
 
 db = SQLAlchemy()
 
+# Bumped after every committed Drink write so cached menus get rebuilt.
+menu_version = 0
+
+
+def mark_menu_dirty():
+    global menu_version
+    menu_version += 1
+
 '''
 setup_db(app)
     binds a flask application and a SQLAlchemy service
+    a file-backed sqlite database is configured with the given storage profile
 '''
-def setup_db(app):
+def setup_db(app, database_path=database_path, profile=storage_profile):
     app.config["SQLALCHEMY_DATABASE_URI"] = database_path
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    sqlite_file = database_path.startswith('sqlite:///') and ':memory:' not in database_path
+    if sqlite_file:
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = STORAGE_PROFILES[profile]['engine_options']
     db.app = app
     db.init_app(app)
+    if sqlite_file and STORAGE_PROFILES[profile]['pragmas']:
+        event.listen(db.get_engine(app), 'connect', _pragma_setter(STORAGE_PROFILES[profile]['pragmas']))
+
+
+def _pragma_setter(pragmas):
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute('PRAGMA {} = {}'.format(name, value))
+        cursor.close()
+    return set_pragmas
 
 '''
 db_drop_and_create_all()
@@ -29,6 +91,18 @@ def db_drop_and_create_all():
     db.drop_all()
     db.create_all()
 
+'''
+recipe_fragments(recipe)
+    the short and long JSON encodings of a recipe blob
+    recipes are parsed once per process and distinct recipe, drinks warm
+    this cache when they are written so menu listings never parse
+'''
+@lru_cache(maxsize=4096)
+def recipe_fragments(recipe):
+    parsed = json.loads(recipe)
+    short_recipe = [{'color': r['color'], 'parts': r['parts']} for r in parsed]
+    return json.dumps(short_recipe), json.dumps(parsed)
+
 '''
 Drink
 a persistent drink entity, extends the base SQLAlchemy Model
@@ -42,13 +116,24 @@ class Drink(db.Model):
     # the required datatype is [{'color': string, 'name':string, 'parts':number}]
     recipe =  Column(String(180), nullable=False)
 
+    '''
+    parsed_recipe
+        the recipe blob parsed once per instance
+        setting recipe clears it
+    '''
+    @property
+    def parsed_recipe(self):
+        parsed = self.__dict__.get('_parsed_recipe')
+        if parsed is None:
+            parsed = self._parsed_recipe = json.loads(self.recipe)
+        return parsed
+
     '''
     short()
         short form representation of the Drink model
     '''
     def short(self):
-        print(json.loads(self.recipe))
-        short_recipe = [{'color': r['color'], 'parts': r['parts']} for r in json.loads(self.recipe)]
+        short_recipe = [{'color': r['color'], 'parts': r['parts']} for r in self.parsed_recipe]
         return {
             'id': self.id,
             'title': self.title,
@@ -63,9 +148,23 @@ class Drink(db.Model):
         return {
             'id': self.id,
             'title': self.title,
-            'recipe': json.loads(self.recipe)
+            'recipe': self.parsed_recipe
         }
 
+    '''
+    short_json() and long_json()
+        short() and long() as encoded JSON objects, built from the
+        precomputed recipe fragments without parsing the recipe
+    '''
+    def short_json(self):
+        return self._json(recipe_fragments(self.recipe)[0])
+
+    def long_json(self):
+        return self._json(recipe_fragments(self.recipe)[1])
+
+    def _json(self, recipe):
+        return '{"id": %s, "title": %s, "recipe": %s}' % (json.dumps(self.id), json.dumps(self.title), recipe)
+
     '''
     insert()
         inserts a new model into a database
@@ -78,6 +177,8 @@ class Drink(db.Model):
     def insert(self):
         db.session.add(self)
         db.session.commit()
+        recipe_fragments(self.recipe)
+        mark_menu_dirty()
 
     '''
     delete()
@@ -90,6 +191,7 @@ class Drink(db.Model):
     def delete(self):
         db.session.delete(self)
         db.session.commit()
+        mark_menu_dirty()
 
     '''
     update()
@@ -102,6 +204,19 @@ class Drink(db.Model):
     '''
     def update(self):
         db.session.commit()
+        recipe_fragments(self.recipe)
+        mark_menu_dirty()
 
     def __repr__(self):
-        return json.dumps(self.short())
\ No newline at end of file
+        return self.short_json()
+
+
+@event.listens_for(Drink.recipe, 'set')
+def _clear_parsed_recipe(target, value, oldvalue, initiator):
+    target.__dict__.pop('_parsed_recipe', None)
+
+
+@event.listens_for(Drink, 'expire')
+@event.listens_for(Drink, 'refresh')
+def _clear_reloaded_recipe(target, *args):
+    target.__dict__.pop('_parsed_recipe', None)
\ No newline at end of file
@@ -0,0 +1,199 @@
+import json
+import os
+import tempfile
+import unittest
+
+from flask import Flask
+from sqlalchemy import text
+
+# The app binds its database on import; the tests use an in-memory one.
+os.environ.setdefault('COFFEE_DATABASE_URL', 'sqlite://')
+
+from fsnd_common.jwks import JWKSCache
+from fsnd_common.token_cache import VerifiedTokenCache
+
+from src.api import app
+from src.auth import auth
+from src.database import models
+from src.database.models import db, db_drop_and_create_all, setup_db, Drink
+from benchmarks import SigningKey
+
+LATTE = [{'name': 'espresso', 'color': 'brown', 'parts': 1}, {'name': 'milk', 'color': 'white', 'parts': 3}]
+MOCHA = [{'name': 'chocolate', 'color': 'darkbrown', 'parts': 1}, {'name': 'espresso', 'color': 'brown', 'parts': 1}]
+
+
+#  Coffee shop API test case class
+class CoffeeShopTestCase(unittest.TestCase):
+
+    # Starts every test from a fresh database holding a latte.
+    def setUp(self):
+        self.app = app
+        self.client = self.app.test_client
+        self.context = self.app.app_context()
+        self.context.push()
+        db_drop_and_create_all()
+        self.latte = Drink(title='Latte', recipe=json.dumps(LATTE))
+        self.latte.insert()
+
+    def tearDown(self):
+        db.session.remove()
+        self.context.pop()
+
+    '''
+        Drink recipes
+    '''
+    # Tests the precomputed JSON matches short() and long()
+    def test_drink_json_matches_representations(self):
+        self.assertEqual(json.loads(self.latte.short_json()), self.latte.short())
+        self.assertEqual(json.loads(self.latte.long_json()), self.latte.long())
+        self.assertEqual(self.latte.short()['recipe'], [{'color': 'brown', 'parts': 1}, {'color': 'white', 'parts': 3}])
+
+    # Tests a reassigned recipe is never served from the stale parse or fragments
+    def test_reassigned_recipe_is_not_stale(self):
+        self.latte.short()
+        self.latte.recipe = json.dumps(MOCHA)
+
+        self.assertEqual(self.latte.long()['recipe'], MOCHA)
+        self.assertEqual(json.loads(self.latte.long_json())['recipe'], MOCHA)
+        self.latte.update()
+        drink = Drink.query.get(self.latte.id)
+        self.assertEqual(json.loads(drink.short_json())['recipe'], [{'color': 'darkbrown', 'parts': 1},
+                                                                    {'color': 'brown', 'parts': 1}])
+
+    # Tests the parsed recipe is dropped when the row is reloaded
+    def test_expired_drink_reparses_recipe(self):
+        self.latte.short()
+        Drink.query.filter_by(id=self.latte.id).update({'recipe': json.dumps(MOCHA)})
+        db.session.commit()
+
+        self.assertEqual(self.latte.long()['recipe'], MOCHA)
+
+    '''
+        GET /drinks
+    '''
+    # Tests the public menu lists every drink in short form
+    def test_get_drinks(self):
+        res = self.client().get('/drinks')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertEqual(data['drinks'], [self.latte.short()])
+        self.assertTrue(res.headers['ETag'])
+
+    # Tests a request carrying the current ETag gets an empty 304
+    def test_304_get_drinks_not_modified(self):
+        etag = self.client().get('/drinks').headers['ETag']
+        res = self.client().get('/drinks', headers={'If-None-Match': etag})
+
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.data, b'')
+
+    # Tests inserting, updating and deleting a drink each rebuild the menu
+    def test_menu_invalidated_by_drink_writes(self):
+        def menu():
+            res = self.client().get('/drinks')
+            return res.headers['ETag'], [drink['title'] for drink in json.loads(res.data)['drinks']]
+
+        etags = [menu()[0]]
+        version = models.menu_version
+
+        Drink(title='Mocha', recipe=json.dumps(MOCHA)).insert()
+        etag, titles = menu()
+        self.assertEqual(titles, ['Latte', 'Mocha'])
+        etags.append(etag)
+
+        self.latte.title = 'Flat White'
+        self.latte.update()
+        etag, titles = menu()
+        self.assertEqual(titles, ['Flat White', 'Mocha'])
+        etags.append(etag)
+
+        self.latte.delete()
+        etag, titles = menu()
+        self.assertEqual(titles, ['Mocha'])
+        etags.append(etag)
+
+        self.assertEqual(models.menu_version, version + 3)
+        self.assertEqual(len(set(etags)), 4)
+        # The ETag of a menu before the writes no longer matches.
+        self.assertEqual(self.client().get('/drinks', headers={'If-None-Match': etags[0]}).status_code, 200)
+
+    '''
+        GET /drinks-detail
+    '''
+    # Returns a token granting permissions, verified against a stub key set
+    # through the app's own permission registry.
+    def token(self, permissions):
+        key = SigningKey(kid='stub-key', bits=1024)
+        saved = auth.jwks, auth.verified_tokens
+        auth.jwks = JWKSCache('stub', fetcher=lambda url: {'keys': [key.jwk()]})
+        auth.verified_tokens = VerifiedTokenCache()
+        self.addCleanup(setattr, auth, 'jwks', saved[0])
+        self.addCleanup(setattr, auth, 'verified_tokens', saved[1])
+        return key.token(auth.AUTH0_DOMAIN, auth.API_AUDIENCE, permissions)
+
+    def get_detail(self, token):
+        return self.client().get('/drinks-detail', headers={'Authorization': 'Bearer ' + token})
+
+    # Tests a token granting get:drinks-detail sees every drink in long form
+    def test_get_drinks_detail(self):
+        res = self.get_detail(self.token(['get:drinks-detail']))
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertEqual(data['drinks'], [self.latte.long()])
+
+    # Tests a token granting it through a wildcard is allowed too
+    def test_get_drinks_detail_wildcard(self):
+        res = self.get_detail(self.token(['get:*']))
+
+        self.assertEqual(res.status_code, 200)
+
+    # Tests a token lacking the permission is forbidden
+    def test_403_get_drinks_detail_missing_permission(self):
+        res = self.get_detail(self.token(['post:drinks']))
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 403)
+        self.assertEqual(data['success'], False)
+        self.assertEqual(data['message'], 'Permission not found.')
+
+    # Tests a request without a token is unauthorized
+    def test_401_get_drinks_detail_without_token(self):
+        res = self.client().get('/drinks-detail')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 401)
+        self.assertEqual(data['success'], False)
+
+    '''
+        Storage profiles
+    '''
+    def pragmas(self, profile, *names):
+        with tempfile.TemporaryDirectory() as directory:
+            profiled = Flask(__name__)
+            try:
+                setup_db(profiled, 'sqlite:///' + os.path.join(directory, 'database.db'), profile)
+                # The scoped session is still bound to the app it was created for.
+                db.session.remove()
+                with profiled.app_context():
+                    values = [db.session.execute(text('PRAGMA ' + name)).scalar() for name in names]
+                    db.session.remove()
+                    db.get_engine(profiled).dispose()
+            finally:
+                db.app = self.app
+        return values
+
+    # Tests the wal profile configures every connection of a file database
+    def test_wal_profile(self):
+        self.assertEqual(self.pragmas('wal', 'journal_mode', 'synchronous', 'busy_timeout'), ['wal', 1, 5000])
+
+    # Tests the default profile leaves sqlite's own settings
+    def test_default_profile(self):
+        self.assertEqual(self.pragmas('default', 'journal_mode', 'synchronous'), ['delete', 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
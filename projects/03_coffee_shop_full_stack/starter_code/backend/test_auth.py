@@ -0,0 +1,157 @@
+import time
+import unittest
+
+from flask import Flask
+from fsnd_common.jwks import JWKSCache
+from fsnd_common.token_cache import VerifiedTokenCache
+
+from src.auth import auth
+from src.auth.auth import AuthError, check_permissions, get_token_auth_header, requires_auth
+from src.auth.rbac import Grant, PermissionRegistry
+from benchmarks import SigningKey
+
+
+#  Auth test case class
+class AuthTestCase(unittest.TestCase):
+
+    # One signing key for all tests, generating it is slow.
+    @classmethod
+    def setUpClass(cls):
+        cls.key = SigningKey(kid='stub-key', bits=1024)
+
+    # Points the auth module at the stub key and fresh caches, restored after the test.
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.saved = auth.jwks, auth.verified_tokens, auth.permissions
+        auth.jwks = JWKSCache('stub', fetcher=lambda url: {'keys': [self.key.jwk()]})
+        auth.verified_tokens = VerifiedTokenCache(maxsize=4)
+        auth.permissions = PermissionRegistry()
+        self.view = requires_auth('get:drinks-detail')(lambda payload: payload)
+
+    def tearDown(self):
+        auth.jwks, auth.verified_tokens, auth.permissions = self.saved
+
+    def token(self, permissions=('get:drinks-detail',), expires_in=3600):
+        return self.key.token(auth.AUTH0_DOMAIN, auth.API_AUDIENCE, permissions, expires_in)
+
+    def call(self, view, token):
+        with self.app.test_request_context(headers={'Authorization': 'Bearer ' + token}):
+            return view()
+
+    '''
+        Authorization header
+    '''
+    # Tests a blank Authorization header is a 401, not an IndexError
+    def test_401_blank_authorization_header(self):
+        with self.app.test_request_context(headers={'Authorization': '   '}):
+            with self.assertRaises(AuthError) as context:
+                get_token_auth_header()
+        self.assertEqual(context.exception.status_code, 401)
+
+    # Tests a bearer token that is not a JWT at all is a 401, not a 500
+    def test_401_garbage_token(self):
+        for token in ('garbage', 'a.b.c'):
+            with self.assertRaises(AuthError) as context:
+                self.call(self.view, token)
+            self.assertEqual(context.exception.status_code, 401)
+            self.assertEqual(context.exception.error['code'], 'invalid_header')
+
+    '''
+        Verified token cache
+    '''
+    # Tests a token is verified once, then served from the cache
+    def test_token_cache_counts_hits_and_misses(self):
+        token = self.token()
+        for _ in range(3):
+            self.assertEqual(self.call(self.view, token)['sub'], 'auth0|bench')
+
+        stats = auth.verified_tokens.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['size']), (2, 1, 1))
+
+    # Tests an expired token is evicted and rejected even though it was cached
+    def test_token_cache_rejects_expired_token(self):
+        token = self.token(expires_in=-60)
+        auth.verified_tokens.put(token, object(), time.time() - 60)
+
+        with self.assertRaises(AuthError) as context:
+            self.call(self.view, token)
+        self.assertEqual(context.exception.status_code, 401)
+        self.assertEqual(context.exception.error['code'], 'token_expired')
+        self.assertEqual(auth.verified_tokens.stats()['size'], 0)
+
+    # Tests a tampered token misses the cache and fails verification
+    def test_token_cache_tampered_token_never_hits(self):
+        token = self.token()
+        self.call(self.view, token)
+        header, payload, signature = token.split('.')
+        tampered = '.'.join([header, payload, signature[::-1]])
+
+        with self.assertRaises(AuthError):
+            self.call(self.view, tampered)
+        stats = auth.verified_tokens.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['size']), (0, 2, 1))
+
+    '''
+        Permissions
+    '''
+    def registry(self):
+        registry = PermissionRegistry()
+        for scope in ('get:drinks-detail', 'post:drinks', 'patch:drinks', 'delete:drinks'):
+            registry.register(scope)
+        return registry
+
+    # Tests granted wildcards expand to the matching registered scopes
+    def test_permission_wildcards(self):
+        registry = self.registry()
+        drinks = Grant({'permissions': ['*:drinks']}, registry)
+        reads = Grant({'permissions': ['get:*']}, registry)
+
+        for scope in ('post:drinks', 'patch:drinks', 'delete:drinks'):
+            self.assertTrue(drinks.allows(registry.mask(scope)))
+            self.assertFalse(reads.allows(registry.mask(scope)))
+        self.assertFalse(drinks.allows(registry.mask('get:drinks-detail')))
+        self.assertTrue(reads.allows(registry.mask('get:drinks-detail')))
+
+    # Tests a compound permission needs all of its scopes, missing any one fails
+    def test_compound_permission(self):
+        registry = self.registry()
+        required = registry.register('post:drinks patch:drinks')
+
+        self.assertTrue(Grant({'permissions': ['post:drinks', 'patch:drinks']}, registry).allows(required))
+        self.assertTrue(Grant({'permissions': ['*:drinks']}, registry).allows(required))
+        self.assertFalse(Grant({'permissions': ['post:drinks']}, registry).allows(required))
+        self.assertFalse(Grant({'permissions': ['patch:drinks']}, registry).allows(required))
+
+    # Tests a grant picks up scopes registered after it was compiled
+    def test_grant_recompiles_after_register(self):
+        registry = self.registry()
+        grant = Grant({'permissions': ['*:drinks']}, registry)
+
+        self.assertTrue(grant.allows(registry.register('put:drinks')))
+
+    # Tests a token without a permissions claim is a bad request
+    def test_400_missing_permissions_claim(self):
+        with self.assertRaises(AuthError) as context:
+            check_permissions('get:drinks-detail', {'sub': 'auth0|bench'})
+        self.assertEqual(context.exception.status_code, 400)
+
+    # Tests a token lacking the route's scope is forbidden
+    def test_403_missing_scope(self):
+        with self.assertRaises(AuthError) as context:
+            self.call(self.view, self.token(permissions=['post:drinks']))
+        self.assertEqual(context.exception.status_code, 403)
+
+    # Tests unknown scopes are rejected at request time instead of registered
+    def test_403_unknown_scope(self):
+        auth.permissions.freeze()
+        with self.assertRaises(AuthError) as context:
+            check_permissions('brew:drinks', {'permissions': ['brew:drinks']})
+        self.assertEqual(context.exception.status_code, 403)
+        self.assertEqual(auth.permissions.version, 1)
+        with self.assertRaises(RuntimeError):
+            requires_auth('brew:drinks')
+        self.assertTrue(check_permissions('get:drinks-detail', {'permissions': ['get:drinks-detail']}))
+
+
+if __name__ == "__main__":
+    unittest.main()